@@ -1,36 +1,61 @@
 from datetime import datetime
+import logging
 import os
-from pymongo import MongoClient, ReturnDocument
+from pymongo import AsyncMongoClient, ReturnDocument
 import uuid
 
+logger = logging.getLogger(__name__)
 
-def save_chat_turn_sync(chat_id: str, text: str, role: str = "system"):
-    mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
-    db = mongo_client["language_app"]
+_default_mongo_client = None
+
+
+# Fallback database for callers that don't pass the shared app db.
+# The client is created once and reused instead of once per call.
+def get_default_db():
+    global _default_mongo_client
+    if _default_mongo_client is None:
+        _default_mongo_client = AsyncMongoClient(os.environ.get("ATLAS_URI"))
+    return _default_mongo_client[os.environ.get("MONGO_DB_NAME", "language_app")]
+
+
+# Appends a message to a chat. When message_id is given the write is
+# idempotent: a message already stored under that id is not added again.
+async def save_chat_turn(
+    chat_id: str, text: str, role: str = "system", db=None, message_id=None
+):
+    if db is None:
+        db = get_default_db()
     collection = db["chat_sessions"]
+    message_id = message_id or str(uuid.uuid4())
+    not_saved = {"chat_id": chat_id, "messages.message_id": {"$ne": message_id}}
 
     # Calculate next turn number
-    doc = collection.find_one_and_update(
-        {"chat_id": chat_id},
+    doc = await collection.find_one_and_update(
+        not_saved,
         {"$inc": {"next_turn": 1}},
         return_document=ReturnDocument.BEFORE,
     )
 
     if not doc:
-        raise ValueError(f"Chat session {chat_id} not found")
+        existing = await collection.find_one(
+            {"chat_id": chat_id}, {"_id": 0, "messages": {"$elemMatch": {"message_id": message_id}}}
+        )
+        if not existing:
+            raise ValueError(f"Chat session {chat_id} not found")
+        return existing["messages"][0]
 
     assigned_turn = doc.get("next_turn", 0)
 
     message = {
-        "message_id": str(uuid.uuid4()),
+        "message_id": message_id,
         "turn": assigned_turn,
         "role": role,
         "text": text,
         "timestamp": datetime.utcnow(),
     }
 
-    collection.find_one_and_update(
-        {"chat_id": chat_id},
+    await collection.find_one_and_update(
+        not_saved,
         {
             "$push": {"messages": message},
             "$set": {
@@ -41,25 +66,23 @@ def save_chat_turn_sync(chat_id: str, text: str, role: str = "system"):
         return_document=ReturnDocument.AFTER,
     )
 
-    print(f"[DB] Inserted turn={assigned_turn} into chat={chat_id}")
-    return assigned_turn
+    logger.debug("Inserted turn=%d into chat=%s", assigned_turn, chat_id)
+    return message
 
-def fetch_short_term_memories(chat_id: str, limit: int = 10):
-    mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
-    db = mongo_client["language_app"]
+async def fetch_short_term_memories(chat_id: str, limit: int = 10, db=None):
+    if db is None:
+        db = get_default_db()
     collection = db["chat_sessions"]
 
-    chat_doc = collection.find_one({"chat_id": chat_id})
+    chat_doc = await collection.find_one({"chat_id": chat_id})
 
     if not chat_doc:
-        print(f"[STM] Chat session not found for chat_id={chat_id}")
-        sample = collection.find_one()
-        print("[STM] Sample chat_sessions document:", sample)
+        logger.warning("Chat session not found for chat_id=%s", chat_id)
         return []
 
     messages = chat_doc.get("messages", [])
     if not messages:
-        print(f"[STM] Chat session {chat_id} has no messages array")
+        logger.debug("Chat session %s has no messages array", chat_id)
         return []
 
     messages = sorted(messages, key=lambda m: m.get("turn", 0))
@@ -68,11 +91,10 @@ def fetch_short_term_memories(chat_id: str, limit: int = 10):
 
     formatted = [f"{m.get('role', 'system')}: {m.get('text', '')}" for m in recent_msgs]
 
-    print(f"[STM] Returning {len(formatted)} short-term messages for chat_id={chat_id}")
-
-    print("[STM] Short-term memory messages:")
-    for f in formatted:
-        print("   ", f)
+    logger.debug("Returning %d short-term messages for chat_id=%s", len(formatted), chat_id)
+    logger.debug(
+        "Short-term memory messages:\n%s", "\n".join(formatted), extra={"payload": True}
+    )
 
     return formatted
 
@@ -107,22 +129,22 @@ def format_memory_context(memories: list) -> str:
     return "\n".join(lines).strip() if lines else ""
 
 
-def load_user_preferences(user_id: str) -> str:
+async def load_user_preferences(user_id: str, db=None) -> str:
     try:
-        mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
-        db = mongo_client["language_app"]
+        if db is None:
+            db = get_default_db()
 
-        doc = db.user_profiles.find_one(
+        doc = await db.user_profiles.find_one(
             {"user_id": user_id}, {"_id": 0, "preferences": 1}
         )
 
         if not doc:
-            print(f"[PREF] No profile found for user {user_id}")
+            logger.debug("No profile found for user %s", user_id)
             return "None provided"
 
         prefs = doc.get("preferences", [])
         if not isinstance(prefs, list):
-            print(f"[PREF] Invalid preferences format for user {user_id}: {prefs}")
+            logger.warning("Invalid preferences format for user %s: %r", user_id, prefs)
             return "None provided"
 
         normalized = []
@@ -130,17 +152,17 @@ def load_user_preferences(user_id: str) -> str:
             if isinstance(p, str):
                 normalized.append(p.lower())
 
-        print(f"[PREF] Loaded preferences for user {user_id}: {normalized}")
+        logger.debug("Loaded preferences for user %s: %s", user_id, normalized)
 
         # Return as a stable string
         return ", ".join(normalized) if normalized else ""
 
     except Exception as e:
-        print(f"[PREF] Error loading preferences for user {user_id}: {e}")
+        logger.warning("Error loading preferences for user %s: %s", user_id, e)
         return ""
 
     except Exception as e:
-        print(f"[PREF] Error loading preferences for user {user_id}: {e}")
+        logger.warning("Error loading preferences for user %s: %s", user_id, e)
         return []
     
     
@@ -0,0 +1,195 @@
+import os
+
+import httpx
+from gridfs import AsyncGridFS
+from pymongo import AsyncMongoClient
+
+from api import agents, testingAgent, writingAgent
+from services.admission import AdmissionController, AdmittedChatOpenAI
+from services.corpus_version import CorpusVersions
+from services.fake_providers import FakeChatModel, fake_providers_enabled, seed_local_corpus
+from services.memory_compaction import MemoryCompactor
+from services.memory_store import ensure_memory_collection
+from services.memory_writer import MemoryWriter
+from services.metrics import (
+    CACHE_ENTRIES,
+    CACHE_HITS,
+    CACHE_MISSES,
+    MEMORY_WRITER_PENDING,
+    MongoCommandMetrics,
+    timed_node,
+)
+from services.providers import HedgedChatModel
+from services.rag_store_qdrant import (
+    QDRANT_IN_MEMORY,
+    get_async_qdrant_client,
+    get_embeddings,
+)
+from services.response_cache import SemanticResponseCache
+from services.retrieval_cache import RetrievalCache
+from services.single_flight import SingleFlight
+from services.usage import UsageCallbackHandler, UsageStore
+
+
+class AppResources:
+    """
+    Process-wide clients and compiled agent graphs.
+
+    Built once in the FastAPI lifespan and stored on app.state so every request
+    reuses the same connection pools and LangGraph apps instead of rebuilding them.
+    Every client here is async so request handlers never block the event loop.
+    """
+
+    def __init__(self, atlas_uri: str):
+        # One pooled HTTP client shared by every OpenAI call (keeps TLS sessions warm)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(
+                    os.environ.get("HTTP_MAX_KEEPALIVE", "20")
+                ),
+            ),
+            timeout=httpx.Timeout(
+                float(os.environ.get("HTTP_TIMEOUT_SECONDS", "120")), connect=10.0
+            ),
+        )
+
+        db_name = os.environ.get("MONGO_DB_NAME", "language_app")
+        if atlas_uri == ":memory:":
+            # In-process Mongo for offline runs (services/fake_mongo.py, needs mongomock)
+            from services.fake_mongo import FakeAsyncGridFS, FakeAsyncMongoClient
+
+            self.mongo_client = FakeAsyncMongoClient()
+            self.db = self.mongo_client[db_name]
+            self.fs = FakeAsyncGridFS(self.db)
+        else:
+            self.mongo_client = AsyncMongoClient(
+                atlas_uri,
+                maxPoolSize=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+                event_listeners=[MongoCommandMetrics()],
+            )
+            self.db = self.mongo_client[db_name]
+            self.fs = AsyncGridFS(self.db)
+
+        self.qdrant = get_async_qdrant_client()
+
+        # Bounded concurrency per model for every outbound LLM/embedding call
+        self.admission = AdmissionController()
+
+        # Full tier; token usage of every call is attributed to the current request
+        self.primary_llm = self._chat_model(
+            os.environ.get("FULL_MODEL", "gpt-5"),
+            os.environ.get("FULL_REASONING_EFFORT", "low"),
+        )
+        # Fast tier for short conversational turns (see services/turn_router.py)
+        self.primary_fast_llm = self._chat_model(
+            os.environ.get("FAST_MODEL", "gpt-5-mini"),
+            os.environ.get("FAST_REASONING_EFFORT", "minimal"),
+        )
+        # Per-call deadline, plus hedging/failover to LLM_BACKUP_PROVIDERS when set
+        self.llm = HedgedChatModel.from_env(
+            self.primary_llm, callbacks=[UsageCallbackHandler()]
+        )
+        self.fast_llm = HedgedChatModel.from_env(
+            self.primary_fast_llm, callbacks=[UsageCallbackHandler()]
+        )
+        # Process-wide cached embeddings (same instance the RAG helpers use)
+        self.embeddings = get_embeddings()
+        self.embeddings.admission = self.admission
+
+        # Graphs are compiled once here and shared across requests
+        self.tutor_agent = agents.ManagerAgent(
+            db=self.db,
+            llm=self.llm,
+            embeddings=self.embeddings,
+            qdrant=self.qdrant,
+            fast_llm=self.fast_llm,
+        )
+        self.testing_agent = testingAgent.ManagerAgent(llm=self.llm)
+        self.writing_agent = writingAgent.ManagerAgent(db=self.db, llm=self.llm)
+
+        # Version stamps of the RAG collections, used to invalidate caches on ingest
+        self.corpus_versions = CorpusVersions(self.db)
+
+        # Lesson/test-plan search results, shared by the tutor and quiz agents
+        self.retrieval_cache = RetrievalCache(self.corpus_versions)
+        self.tutor_agent.retrieval_cache = self.retrieval_cache
+        self.testing_agent.retrieval_cache = self.retrieval_cache
+
+        # Opt-in: lesson-scoped semantic cache of tutor responses
+        self.response_cache = None
+        if os.environ.get("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"):
+            self.response_cache = SemanticResponseCache(
+                self.corpus_versions, agents.LESSON_COLLECTION
+            )
+            self.tutor_agent.response_cache = self.response_cache
+
+        # Memory extraction (summary, classification, long-term memories) runs
+        # off the response path, in micro-batches; chat history is saved inline
+        self.memory_writer = MemoryWriter(
+            handler=timed_node("memory_writer", "persist_turns", self.tutor_agent.persist_turns)
+        )
+        self.tutor_agent.memory_writer = self.memory_writer
+
+        # Shared by the agent endpoints to coalesce duplicate in-flight requests
+        self.single_flight = SingleFlight()
+
+        self.usage_store = UsageStore(self.db)
+        self.tutor_agent.usage_store = self.usage_store
+
+        # Periodic merge of near-duplicate long-term memories
+        self.memory_compactor = MemoryCompactor(self.qdrant)
+
+    # OpenAI by default; LLM_PROVIDER=fake for offline runs (services/fake_providers.py)
+    def _chat_model(self, model: str, reasoning_effort: str):
+        if fake_providers_enabled():
+            return FakeChatModel.from_env(
+                model_name=f"fake-{model}", callbacks=[UsageCallbackHandler()]
+            )
+        return AdmittedChatOpenAI(
+            model=model,
+            reasoning_effort=reasoning_effort,
+            http_async_client=self.http_client,
+            stream_usage=True,
+            callbacks=[UsageCallbackHandler()],
+            admission=self.admission,
+        )
+
+    # Copies the cache/writer counters into the metrics registry before a scrape
+    def collect_metrics(self):
+        emb = self.embeddings.stats()
+        CACHE_HITS.set(emb["memory_hits"] + emb["disk_hits"], cache="embeddings")
+        CACHE_MISSES.set(emb["misses"], cache="embeddings")
+        CACHE_ENTRIES.set(emb["memory_entries"], cache="embeddings")
+
+        retrieval = self.retrieval_cache.stats()
+        for name, counts in retrieval["collections"].items():
+            CACHE_HITS.set(counts["hits"], cache=f"retrieval:{name}")
+            CACHE_MISSES.set(counts["misses"], cache=f"retrieval:{name}")
+        CACHE_ENTRIES.set(retrieval["entries"], cache="retrieval")
+
+        if self.response_cache is not None:
+            responses = self.response_cache.stats()
+            CACHE_HITS.set(responses["hits"], cache="responses")
+            CACHE_MISSES.set(responses["misses"], cache="responses")
+            CACHE_ENTRIES.set(responses["entries"], cache="responses")
+
+        MEMORY_WRITER_PENDING.set(self.memory_writer.pending())
+
+    async def start(self):
+        if QDRANT_IN_MEMORY:
+            await seed_local_corpus(
+                self.qdrant,
+                self.embeddings,
+                [agents.LESSON_COLLECTION, testingAgent.TEST_COLLECTION],
+            )
+        await ensure_memory_collection(self.qdrant)
+        await self.usage_store.ensure_indexes()
+        await self.memory_writer.start()
+        self.memory_compactor.start()
+
+    async def close(self):
+        await self.memory_compactor.stop()
+        await self.memory_writer.stop()
+        await self.http_client.aclose()
+        await self.mongo_client.close()
@@ -1,17 +1,25 @@
 from dotenv import load_dotenv
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from langgraph.graph import StateGraph, END, START
 from langchain_openai import ChatOpenAI
-from services.rag_store_qdrant import query_qdrant
-import os
+from api.usage import get_usage_store
+from services.admission import AdmissionRejected
+from services.metrics import timed_node, track
+from services.providers import DeadlineExceeded
+from services.rag_store_qdrant import aquery_qdrant
+from services.single_flight import fingerprint
+from services.usage import RequestUsage, track_usage, usage_node
 import json
-from pymongo import MongoClient
-import time
+import logging
 
 load_dotenv()
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+TEST_COLLECTION = "vietnamese_test_store"
+
 # In-memory quiz state
 conversation_store = {}
 
@@ -27,22 +35,19 @@ class AgentState(dict):
 
 
 class ManagerAgent:
-    def __init__(self, llm_model="gpt-5"):
+    def __init__(self, llm_model="gpt-5", llm=None):
         self.agents = {"general_agent": self.general_agent}
-        self.llm = ChatOpenAI(model="gpt-5", reasoning_effort="low")
-        self.mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
+        self.llm = llm or ChatOpenAI(model=llm_model, reasoning_effort="low")
+        # Optional RetrievalCache, set by AppResources
+        self.retrieval_cache = None
 
         self.graph = self.build_graph()
         self.app = self.graph.compile()
 
-    def general_agent(self, state: AgentState):
-        print(
-            "Time general agent:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        )
-
+    async def general_agent(self, state: AgentState):
         refs = state.get("docs", [])
         chat_id = state.get("chat_id")
-        print(refs)
+        logger.debug("Quiz references: %s", refs, extra={"payload": True})
         prompt = f"""
         You are a English to Vietnamese quiz generator.
 
@@ -82,7 +87,8 @@ class ManagerAgent:
             },
         )
 
-        resp = self.llm.invoke(prompt, response_format={"type": "json_object"})
+        with track("openai", "chat"):
+            resp = await self.llm.ainvoke(prompt, response_format={"type": "json_object"})
 
         parsed = resp.content
 
@@ -91,49 +97,64 @@ class ManagerAgent:
 
         return {"response": parsed, "question": parsed}
 
-    def handle_user_prompt(self, state: AgentState):
-        print("Time user prompt:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+    async def handle_user_prompt(self, state: AgentState):
         return {"user_input": state["user_input"]}
 
-    def retrieve_memories(self, state: AgentState):
-        print(
-            "Time retrieve memories:",
-            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-        )
+    async def retrieve_memories(self, state: AgentState):
         return {"memories": []}
 
-    def search_rag_documents(self, state: AgentState):
-        print("Time search rag:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+    async def search_rag_documents(self, state: AgentState):
         query_text = state.get("user_input", "")
 
+        async def search():
+            with track("qdrant", "search"), usage_node("rag_docs"):
+                search_result = await aquery_qdrant(TEST_COLLECTION, query_text, top_k=1)
+            return [
+                {"text": hit.payload.get("text", ""), "score": hit.score}
+                for hit in search_result
+            ]
+
         try:
-            search_result = query_qdrant("vietnamese_test_store", query_text, top_k=1)
-            docs = [hit.payload.get("text", "") for hit in search_result]
+            if self.retrieval_cache is not None:
+                results = await self.retrieval_cache.fetch(
+                    TEST_COLLECTION, query_text, 1, search
+                )
+            else:
+                results = await search()
+            docs = [r["text"] for r in results]
+        except (AdmissionRejected, DeadlineExceeded):
+            # Saturated: fail fast with 429/504 (see main.py) instead of
+            # spending an LLM call on a quiz without documents
+            raise
         except Exception as e:
-            print(f"RAG search error: {e}")
+            logger.warning("RAG search error: %s", e)
             docs = [f"Could not retrieve documents. Error: {e}"]
 
         return {"docs": docs}
 
-    def planner(self, state: AgentState):
+    async def planner(self, state: AgentState):
         return {}
 
-    def merge_docs(self, state: AgentState, **kwargs):
+    async def merge_docs(self, state: AgentState, **kwargs):
         combined = state.get("memories", []) + state.get("docs", [])
         return {"docs": combined}
 
-    def update_memory(self, state: AgentState):
+    async def update_memory(self, state: AgentState):
         return {}
 
     def build_graph(self):
         graph = StateGraph(AgentState)
 
-        graph.add_node("input", self.handle_user_prompt)
-        graph.add_node("memories", self.retrieve_memories)
-        graph.add_node("rag_docs", self.search_rag_documents)
-        graph.add_node("merge_docs", self.merge_docs)  # optional
-        graph.add_node("planner", self.planner)
-        graph.add_node("general_agent", self.general_agent)
+        nodes = {
+            "input": self.handle_user_prompt,
+            "memories": self.retrieve_memories,
+            "rag_docs": self.search_rag_documents,
+            "merge_docs": self.merge_docs,  # optional
+            "planner": self.planner,
+            "general_agent": self.general_agent,
+        }
+        for name, fn in nodes.items():
+            graph.add_node(name, timed_node("quiz", name, fn))
 
         graph.add_edge(START, "input")
         graph.add_edge("input", "memories")
@@ -145,7 +166,7 @@ class ManagerAgent:
 
         return graph
 
-    def invoke(self, user_id, chat_id, user_input):
+    async def ainvoke(self, user_id, chat_id, user_input):
         state = AgentState(
             user_id=user_id,
             chat_id=chat_id,
@@ -154,18 +175,40 @@ class ManagerAgent:
             docs=[],
             response="",
         )
-        return self.app.invoke(state, config={"configurable": {"chat_id": chat_id}})
+        return await self.app.ainvoke(state, config={"configurable": {"chat_id": chat_id}})
+
+
+def get_agent(request: Request):
+    return request.app.state.resources.testing_agent
+
+
+def get_single_flight(request: Request):
+    return request.app.state.resources.single_flight
 
 
 @router.post("/invoke-agent-test")
-def invoke_agent(payload: dict):
-    agent = ManagerAgent()
+async def invoke_agent(
+    payload: dict,
+    background_tasks: BackgroundTasks,
+    agent=Depends(get_agent),
+    usage_store=Depends(get_usage_store),
+    single_flight=Depends(get_single_flight),
+):
 
     chat_id = payload.get("chat_id")
     user_id = payload.get("user_id")
     input_string = payload.get("input_string", "")
 
-    state = agent.invoke(user_id, chat_id, input_string)
+    usage = RequestUsage("invoke-agent-test", user_id, chat_id)
+    background_tasks.add_task(usage_store.save, usage)
+
+    async def run():
+        with track_usage(usage):
+            return await agent.ainvoke(user_id, chat_id, input_string)
+
+    # Identical concurrent requests share one quiz generation
+    key = fingerprint("invoke-agent-test", user_id, chat_id, input_string)
+    state = await single_flight.do("invoke-agent-test", key, run)
 
     raw = (
         state.get("response")
@@ -182,5 +225,5 @@ def invoke_agent(payload: dict):
         parsed = json.loads(raw)
         return parsed
     except Exception:
-        print("WARNING: LLM returned invalid JSON:", raw)
+        logger.warning("LLM returned invalid JSON: %s", raw)
         return {"questions": []}
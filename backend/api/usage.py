@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+
+router = APIRouter()
+
+
+def get_usage_store(request: Request):
+    return request.app.state.resources.usage_store
+
+
+# Token and cost totals from the `usage` collection, grouped by one key.
+# group_by=node breaks requests down into graph nodes / memory-writer steps.
+@router.get("/summary")
+async def usage_summary(
+    group_by: Literal["user_id", "chat_id", "endpoint", "node", "model"] = "user_id",
+    user_id: Optional[str] = None,
+    chat_id: Optional[str] = None,
+    endpoint: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    store=Depends(get_usage_store),
+):
+    match = {}
+    if user_id:
+        match["user_id"] = user_id
+    if chat_id:
+        match["chat_id"] = chat_id
+    if endpoint:
+        match["endpoint"] = endpoint
+    if since:
+        match["created_at"] = {"$gte": since}
+
+    pipeline = [{"$match": match}]
+    if group_by in ("node", "model"):
+        pipeline += [
+            {"$unwind": "$nodes"},
+            {
+                "$group": {
+                    "_id": f"$nodes.{group_by}",
+                    "calls": {"$sum": "$nodes.calls"},
+                    "input_tokens": {"$sum": "$nodes.input_tokens"},
+                    "output_tokens": {"$sum": "$nodes.output_tokens"},
+                    "total_tokens": {"$sum": "$nodes.total_tokens"},
+                    "cost_usd": {"$sum": "$nodes.cost_usd"},
+                }
+            },
+        ]
+    else:
+        pipeline.append(
+            {
+                "$group": {
+                    "_id": f"${group_by}",
+                    "requests": {"$sum": 1},
+                    "input_tokens": {"$sum": "$input_tokens"},
+                    "output_tokens": {"$sum": "$output_tokens"},
+                    "total_tokens": {"$sum": "$total_tokens"},
+                    "cost_usd": {"$sum": "$cost_usd"},
+                }
+            }
+        )
+    pipeline += [{"$sort": {"cost_usd": -1}}, {"$limit": limit}]
+
+    cursor = await store.collection.aggregate(pipeline)
+    rows = await cursor.to_list()
+    for row in rows:
+        row[group_by] = row.pop("_id")
+    return {"group_by": group_by, "results": rows}
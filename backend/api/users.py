@@ -22,6 +22,7 @@ from models.userschema import (
 )
 from typing import List, Optional
 from pathlib import Path
+import asyncio
 import tempfile
 import uuid
 from pypdf import PdfReader
@@ -68,6 +69,11 @@ def text_to_pdf_bytes(text: str) -> bytes:
     return pdf_bytes
 
 
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return "".join(page.extract_text() or "" for page in reader.pages)  # plain text [web:22]
+
+
 def get_db_fs(request: Request):
     return request.app.state.db, request.app.state.fs
 
@@ -79,7 +85,7 @@ Endpoints: (1) create user profile (2) get user profile (3) edit user profile (4
 
 
 @router.get("/check")
-def check(db_fs=Depends(get_db_fs)):
+async def check(db_fs=Depends(get_db_fs)):
     db, _ = db_fs
     # Use the user_profiles collection for the health check document.
     coll = db.user_profiles
@@ -87,15 +93,15 @@ def check(db_fs=Depends(get_db_fs)):
     # Ensure a test document with _id 0 exists (insert only if missing).
 
     # Return all documents from the collection with _id excluded in the projection
-    docs = list(coll.find({}, {"_id": 0}))
+    docs = await coll.find({}, {"_id": 0}).to_list()
     return {"status": "User API is up", "docs": docs}
 
 
 # (1) Create User profile
 @router.post("/profiles", response_model=UserProfile, status_code=201)
-def create_user_profile(payload: UserProfileCreate, db_fs=Depends(get_db_fs)):
+async def create_user_profile(payload: UserProfileCreate, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
-    if db.user_profiles.find_one({"user_id": payload.user_id}):
+    if await db.user_profiles.find_one({"user_id": payload.user_id}):
         raise HTTPException(status_code=409, detail="User profile already exists")
     now = datetime.utcnow()
     profile = UserProfile(
@@ -106,15 +112,15 @@ def create_user_profile(payload: UserProfileCreate, db_fs=Depends(get_db_fs)):
         score_streak=1,
         lessons_completed=[],
     )
-    db.user_profiles.insert_one(profile.model_dump())
+    await db.user_profiles.insert_one(profile.model_dump())
     return profile
 
 
 # (2) Get User profile
 @router.get("/profiles/{user_id}", response_model=UserProfile)
-def get_user_profile(user_id: str, db_fs=Depends(get_db_fs)):
+async def get_user_profile(user_id: str, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
-    profile = db.user_profiles.find_one({"user_id": user_id}, {"_id": 0})
+    profile = await db.user_profiles.find_one({"user_id": user_id}, {"_id": 0})
 
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
@@ -141,7 +147,7 @@ def get_user_profile(user_id: str, db_fs=Depends(get_db_fs)):
         score_streak = 1
 
     # --- Update DB with last_seen and new streak ---
-    db.user_profiles.update_one(
+    await db.user_profiles.update_one(
         {"user_id": user_id}, {"$set": {"last_seen": now, "score_streak": score_streak}}
     )
 
@@ -154,14 +160,14 @@ def get_user_profile(user_id: str, db_fs=Depends(get_db_fs)):
 
 # (3) edit User profile
 @router.patch("/profiles/{user_id}", response_model=UserProfile)
-def edit_user_profile(user_id: str, updates: EditProfile, db_fs=Depends(get_db_fs)):
+async def edit_user_profile(user_id: str, updates: EditProfile, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
     update_data = {
         k: v for k, v in updates.dict(exclude_unset=True).items() if v is not None
     }
     if not update_data:
         raise HTTPException(status_code=400, detail="No updates provided")
-    updated_profile = db.user_profiles.find_one_and_update(
+    updated_profile = await db.user_profiles.find_one_and_update(
         {"user_id": user_id},
         {"$set": update_data},
         return_document=ReturnDocument.AFTER,
@@ -174,9 +180,9 @@ def edit_user_profile(user_id: str, updates: EditProfile, db_fs=Depends(get_db_f
 
 # (4) get User score streak
 @router.get("/profiles/{user_id}/score-streak")
-def get_score_streak(user_id: str, db_fs=Depends(get_db_fs)):
+async def get_score_streak(user_id: str, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
-    profile = db.user_profiles.find_one(
+    profile = await db.user_profiles.find_one(
         {"user_id": user_id}, {"_id": 0, "score_streak": 1}
     )
     if not profile:
@@ -192,18 +198,18 @@ def get_score_streak(user_id: str, db_fs=Depends(get_db_fs)):
 
 # (1) create new chat session
 @router.post("/chats", response_model=ChatSession, status_code=201)
-def create_new_chat(
+async def create_new_chat(
     user_id: str, chat_name: Optional[str] = None, db_fs=Depends(get_db_fs)
 ):
     db, _ = db_fs
     chat = ChatSession(user_id=user_id, chat_name=chat_name)
-    db.chat_sessions.insert_one(chat.model_dump())
+    await db.chat_sessions.insert_one(chat.model_dump())
     return chat
 
 
 # (2) Save a new turn in chat session
 @router.post("/chats/{chat_id}/turns", response_model=ChatSession)
-def add_turn(chat_id: str, message: Message, db_fs=Depends(get_db_fs)):
+async def add_turn(chat_id: str, message: Message, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
 
     update = {
@@ -214,7 +220,7 @@ def add_turn(chat_id: str, message: Message, db_fs=Depends(get_db_fs)):
         },
     }
 
-    updated_chat = db.chat_sessions.find_one_and_update(
+    updated_chat = await db.chat_sessions.find_one_and_update(
         {"chat_id": chat_id}, update, return_document=ReturnDocument.AFTER
     )
 
@@ -227,7 +233,7 @@ def add_turn(chat_id: str, message: Message, db_fs=Depends(get_db_fs)):
 
 # (3) List all chat sessions for a user
 @router.get("/chats/user/{user_id}", response_model=List[ChatSession])
-def list_user_chats(user_id: str, db_fs=Depends(get_db_fs)):
+async def list_user_chats(user_id: str, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
 
     # Only return metadata fields
@@ -245,11 +251,11 @@ def list_user_chats(user_id: str, db_fs=Depends(get_db_fs)):
         "agent_context": 1,
     }
 
-    chats = list(
+    chats = await (
         db.chat_sessions.find({"user_id": user_id}, projection).sort(
             "last_seen_at", -1
         )  # latest chats first
-    )
+    ).to_list()
 
     if not chats:
         raise HTTPException(
@@ -261,7 +267,7 @@ def list_user_chats(user_id: str, db_fs=Depends(get_db_fs)):
 
 # (4) Retrieve a specific chat session
 @router.get("/chats/{chat_id}/messages", response_model=List[Message])
-def get_messages(
+async def get_messages(
     chat_id: str,
     last_index: int = Query(0, ge=0, description="Index of last message received"),
     db_fs=Depends(get_db_fs),
@@ -283,7 +289,7 @@ def get_messages(
         "last_message_at": 1,
     }
 
-    chat = db.chat_sessions.find_one_and_update(
+    chat = await db.chat_sessions.find_one_and_update(
         {"chat_id": chat_id},
         {"$set": {"last_seen_at": datetime.utcnow()}},
         projection=slice_query,
@@ -310,17 +316,14 @@ async def upload_document(user_id: str, file: UploadFile, db_fs=Depends(get_db_f
 
     # Save PDF to GridFS
     db, fs = db_fs
-    file_id = fs.put(pdf_bytes, filename=file.filename)
+    file_id = await fs.put(pdf_bytes, filename=file.filename)
 
-    # Extract text from the in-memory bytes
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    text = "".join(
-        page.extract_text() or "" for page in reader.pages
-    )  # plain text [web:22]
+    # Extract text from the in-memory bytes (CPU bound, keep it off the event loop)
+    text = await asyncio.to_thread(extract_pdf_text, pdf_bytes)
 
     # Save metadata
     doc_id = str(uuid.uuid4())
-    db.user_documents.insert_one(
+    await db.user_documents.insert_one(
         {
             "doc_id": doc_id,
             "user_id": user_id,
@@ -343,12 +346,12 @@ async def upload_text_document(
     db, fs = db_fs
     text = payload["text"]
 
-    pdf_bytes = text_to_pdf_bytes(text)
-    file_id = fs.put(pdf_bytes, filename=f"{file_name}.pdf")
+    pdf_bytes = await asyncio.to_thread(text_to_pdf_bytes, text)
+    file_id = await fs.put(pdf_bytes, filename=f"{file_name}.pdf")
 
     # Save metadata
     doc_id = str(uuid.uuid4())
-    db.user_documents.insert_one(
+    await db.user_documents.insert_one(
         {
             "doc_id": doc_id,
             "user_id": user_id,
@@ -365,27 +368,25 @@ async def upload_text_document(
 
 # List all User Documents
 @router.get("/documents/{user_id}")
-def list_documents(user_id: str, db_fs=Depends(get_db_fs)):
+async def list_documents(user_id: str, db_fs=Depends(get_db_fs)):
     db, fs = db_fs
-    docs = list(
-        db.user_documents.find(
-            {"user_id": user_id},
-            {"_id": 0, "doc_id": 1, "file_name": 1, "created_at": 1},
-        )
-    )
+    docs = await db.user_documents.find(
+        {"user_id": user_id},
+        {"_id": 0, "doc_id": 1, "file_name": 1, "created_at": 1},
+    ).to_list()
     return {"documents": docs}
 
 
 # Retrieve a specific document
 @router.get("/documents/{user_id}/{doc_id}")
-def download_document(user_id: str, doc_id: str, db_fs=Depends(get_db_fs)):
+async def download_document(user_id: str, doc_id: str, db_fs=Depends(get_db_fs)):
     db, fs = db_fs
-    doc = db.user_documents.find_one({"user_id": user_id, "doc_id": doc_id})
+    doc = await db.user_documents.find_one({"user_id": user_id, "doc_id": doc_id})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    gridout = fs.get(doc["gridfs_id"])
-    pdf_bytes = gridout.read()
+    gridout = await fs.get(doc["gridfs_id"])
+    pdf_bytes = await gridout.read()
 
     original_name = doc["file_name"]
     ascii_fallback = "document.pdf"
@@ -404,29 +405,29 @@ def download_document(user_id: str, doc_id: str, db_fs=Depends(get_db_fs)):
 
 # Delete a specific document
 @router.delete("/documents/{user_id}/{doc_id}")
-def delete_document(user_id: str, doc_id: str, db_fs=Depends(get_db_fs)):
+async def delete_document(user_id: str, doc_id: str, db_fs=Depends(get_db_fs)):
     db, fs = db_fs
-    doc = db.user_documents.find_one({"user_id": user_id, "doc_id": doc_id})
+    doc = await db.user_documents.find_one({"user_id": user_id, "doc_id": doc_id})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
     # Delete from GridFS
-    fs.delete(doc["gridfs_id"])
+    await fs.delete(doc["gridfs_id"])
 
     # Delete metadata
-    db.user_documents.delete_one({"doc_id": doc_id})
+    await db.user_documents.delete_one({"doc_id": doc_id})
 
     return {"message": "Document deleted successfully", "doc_id": doc_id}
 
 
 # Quiz stuff
 @router.post("/quiz/submit", status_code=201)
-def submit_quiz(payload: QuizPost, db_fs=Depends(get_db_fs)):
+async def submit_quiz(payload: QuizPost, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
 
     quiz_data = payload.model_dump()
 
-    result = db.quiz_results.insert_one(quiz_data)
+    result = await db.quiz_results.insert_one(quiz_data)
 
     if not result.inserted_id:
         raise HTTPException(status_code=500, detail="Failed to store quiz")
@@ -439,16 +440,16 @@ def submit_quiz(payload: QuizPost, db_fs=Depends(get_db_fs)):
 
 
 @router.get("/quiz/{user_id}", response_model=List[QuizPost])
-def get_user_quizzes(user_id: str, db_fs=Depends(get_db_fs)):
+async def get_user_quizzes(user_id: str, db_fs=Depends(get_db_fs)):
     """
     Retrieve all quiz submissions for a specific user.
     Sorted newest → oldest.
     """
     db, _ = db_fs
 
-    quizzes = list(
+    quizzes = await (
         db.quiz_results.find({"user_id": user_id}, {"_id": 0}).sort("timestamp", -1)
-    )
+    ).to_list()
 
     return quizzes
 
@@ -457,10 +458,10 @@ def get_user_quizzes(user_id: str, db_fs=Depends(get_db_fs)):
 
 
 @router.get("/preferences/{user_id}")
-def get_user_preferences(user_id: str, db_fs=Depends(get_db_fs)):
+async def get_user_preferences(user_id: str, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
 
-    profile = db.user_profiles.find_one(
+    profile = await db.user_profiles.find_one(
         {"user_id": user_id}, {"_id": 0, "preferences": 1}
     )
 
@@ -472,7 +473,7 @@ def get_user_preferences(user_id: str, db_fs=Depends(get_db_fs)):
 
 
 @router.patch("/preferences/{user_id}")
-def update_user_preferences(user_id: str, payload: dict, db_fs=Depends(get_db_fs)):
+async def update_user_preferences(user_id: str, payload: dict, db_fs=Depends(get_db_fs)):
     db, _ = db_fs
 
     prefs = payload.get("preferences")
@@ -498,7 +499,7 @@ def update_user_preferences(user_id: str, payload: dict, db_fs=Depends(get_db_fs
         "preferences_object": bool_prefs,  # optional but useful for agent
     }
 
-    updated = db.user_profiles.find_one_and_update(
+    updated = await db.user_profiles.find_one_and_update(
         {"user_id": user_id},
         {"$set": update_data},
         return_document=ReturnDocument.AFTER,
@@ -1,19 +1,25 @@
 from dotenv import load_dotenv
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 from langgraph.graph import StateGraph, END, START
 from langchain_openai import ChatOpenAI
 import os
 import json
-from pymongo import MongoClient
-import time
+import logging
+from pymongo import AsyncMongoClient
 from api.miscellanous import (
     normalize_llm_response,
 )  # still used for fallback in endpoint, not for JSON-mode
+from api.usage import get_usage_store
+from services.metrics import timed_node, track
+from services.single_flight import fingerprint
+from services.usage import RequestUsage, track_usage
 
 load_dotenv()
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 class AgentState(dict):
     user_id: str
@@ -27,18 +33,18 @@ class AgentState(dict):
 
 
 class ManagerAgent:
-    def __init__(self, llm_model="gpt-5"):
-        self.llm = ChatOpenAI(model="gpt-5", reasoning_effort="low")
-        self.mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
+    def __init__(self, llm_model="gpt-5", db=None, llm=None):
+        if db is None:
+            db = AsyncMongoClient(os.environ.get("ATLAS_URI"))[
+                os.environ.get("MONGO_DB_NAME", "language_app")
+            ]
+        self.db = db
+        self.llm = llm or ChatOpenAI(model=llm_model, reasoning_effort="low")
 
         self.graph = self.build_graph()
         self.app = self.graph.compile()
 
-    def general_agent(self, state: AgentState):
-        print(
-            "Time general agent:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        )
-
+    async def general_agent(self, state: AgentState):
         documents = state.get("memories", [])
 
         prompt = f"""
@@ -66,21 +72,17 @@ class ManagerAgent:
         {documents}
         """
 
-        resp = self.llm.invoke(prompt, response_format={"type": "json_object"})
+        with track("openai", "chat"):
+            resp = await self.llm.ainvoke(prompt, response_format={"type": "json_object"})
         parsed = resp.content
 
         return {"response": parsed}
 
-    def handle_user_prompt(self, state: AgentState):
+    async def handle_user_prompt(self, state: AgentState):
         return {}
 
-    def retrieve_memories(self, state: AgentState):
-        print(
-            "Time retrieve memories:",
-            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-        )
-
-        doc = self.mongo_client["language_app"].user_documents.find_one(
+    async def retrieve_memories(self, state: AgentState):
+        doc = await self.db.user_documents.find_one(
             {"user_id": state["user_id"], "doc_id": state["doc_id"]},
             {"_id": 0, "text_extracted": 1},
         )
@@ -89,30 +91,31 @@ class ManagerAgent:
             return {"memories": [doc["text_extracted"]]}
         return {"memories": []}
 
-    def search_rag_documents(self, state: AgentState):
+    async def search_rag_documents(self, state: AgentState):
         return {}
 
-    def planner(self, state: AgentState):
+    async def planner(self, state: AgentState):
         return {}
 
-    def merge_docs(self, state: AgentState, **kwargs):
+    async def merge_docs(self, state: AgentState, **kwargs):
         return {}
 
-    def update_memory(self, state: AgentState):
-        print(
-            "Time update memory:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        )
+    async def update_memory(self, state: AgentState):
         return {}
 
     def build_graph(self):
         graph = StateGraph(AgentState)
 
-        graph.add_node("input", self.handle_user_prompt)
-        graph.add_node("memories", self.retrieve_memories)
-        graph.add_node("rag_docs", self.search_rag_documents)
-        graph.add_node("planner", self.planner)
-        graph.add_node("general_agent", self.general_agent)
-        graph.add_node("merge_docs", self.merge_docs)
+        nodes = {
+            "input": self.handle_user_prompt,
+            "memories": self.retrieve_memories,
+            "rag_docs": self.search_rag_documents,
+            "planner": self.planner,
+            "general_agent": self.general_agent,
+            "merge_docs": self.merge_docs,
+        }
+        for name, fn in nodes.items():
+            graph.add_node(name, timed_node("writing", name, fn))
 
         graph.add_edge(START, "input")
         graph.add_edge("input", "memories")
@@ -124,7 +127,7 @@ class ManagerAgent:
 
         return graph
 
-    def invoke(self, user_id, chat_id, doc_id):
+    async def ainvoke(self, user_id, chat_id, doc_id):
         state = AgentState(
             user_id=user_id,
             chat_id=chat_id,
@@ -133,18 +136,40 @@ class ManagerAgent:
             docs=[],
             response="",
         )
-        return self.app.invoke(state, config={"configurable": {"chat_id": chat_id}})
+        return await self.app.ainvoke(state, config={"configurable": {"chat_id": chat_id}})
+
+
+def get_agent(request: Request):
+    return request.app.state.resources.writing_agent
+
+
+def get_single_flight(request: Request):
+    return request.app.state.resources.single_flight
 
 
 @router.post("/invoke-agent-writing")
-def invoke_agent(payload: dict):
-    agent = ManagerAgent()
+async def invoke_agent(
+    payload: dict,
+    background_tasks: BackgroundTasks,
+    agent=Depends(get_agent),
+    usage_store=Depends(get_usage_store),
+    single_flight=Depends(get_single_flight),
+):
 
     chat_id = payload.get("chat_id")
     user_id = payload.get("user_id")
     doc_id = payload.get("doc_id")
 
-    state = agent.invoke(user_id, chat_id, doc_id)
+    usage = RequestUsage("invoke-agent-writing", user_id, chat_id)
+    background_tasks.add_task(usage_store.save, usage)
+
+    async def run():
+        with track_usage(usage):
+            return await agent.ainvoke(user_id, chat_id, doc_id)
+
+    # Identical concurrent requests share one review of the document
+    key = fingerprint("invoke-agent-writing", user_id, chat_id, doc_id)
+    state = await single_flight.do("invoke-agent-writing", key, run)
 
     raw = (
         state.get("response")
@@ -159,5 +184,5 @@ def invoke_agent(payload: dict):
         parsed = json.loads(raw)
         return parsed
     except Exception:
-        print("WARNING: LLM returned invalid JSON:", raw)
+        logger.warning("LLM returned invalid JSON: %s", raw)
         return {"suggestions": []}
@@ -0,0 +1,299 @@
+"""
+Load test for the agent and chat endpoints, run in-process against the ASGI app.
+
+LLM calls and embeddings use the fake providers (LLM_PROVIDER=fake) and Qdrant
+runs in memory, so results measure our own overhead: FastAPI, LangGraph, Mongo,
+Qdrant and the caches. Mongo runs in-process too by default (--mongo-uri
+:memory:, services/fake_mongo.py, needs mongomock), so no server is needed;
+its timings say nothing about real Mongo. Point --mongo-uri at a local
+instance to include it: the run then uses its own database (--db-name),
+dropped afterwards unless --keep-db.
+
+    python load_test.py --duration 30 --concurrency 32
+    python load_test.py --rate 20 --mix agent=3,test=1,writing=1,chats=2 --out before.json
+
+With --rate 0 (default) each of --concurrency workers sends requests
+back-to-back (closed loop). With --rate R requests arrive as a Poisson
+process at R/s (open loop), at most --concurrency in flight.
+Prints a JSON report: latency percentiles and throughput per endpoint, and a
+per-node breakdown of the LangGraph graphs from the app's own metrics.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+
+INPUTS = [
+    "hi",
+    "cảm ơn",
+    "how do you say coffee",
+    "why does this sentence use đã here",
+    "can you explain the difference between anh and em",
+    "quiz me on greetings",
+    "correct my sentence: tôi đi ăn cơm hôm qua",
+    "what does xin chào mean",
+]
+
+DOCUMENT = "Hôm qua tôi đi chợ mua rau. Tôi thích ăn phở bò nhưng không thích cay."
+
+
+def parse_mix(raw: str) -> dict:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip():
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest rank
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, duration):
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        **{
+            f"p{q}_ms": round(percentile(latencies, q) * 1000, 2) if latencies else None
+            for q in (50, 95, 99)
+        },
+    }
+
+
+def node_breakdown(before, after, buckets):
+    """Per-node count/mean/p95 from the NODE_LATENCY histogram, for this run only."""
+    bounds = list(buckets) + [float("inf")]
+    nodes = {}
+    for key, (cumulative, count, total) in after.items():
+        prev_cumulative, prev_count, prev_total = before.get(
+            key, ([0] * len(cumulative), 0, 0.0)
+        )
+        count -= prev_count
+        if count <= 0:
+            continue
+        cumulative = [a - b for a, b in zip(cumulative, prev_cumulative)]
+        # Upper bound of the bucket holding the 95th percentile
+        p95 = next(bound for bound, c in zip(bounds, cumulative) if c >= 0.95 * count)
+        graph, node = key
+        nodes[f"{graph}.{node}"] = {
+            "calls": count,
+            "mean_ms": round((total - prev_total) / count * 1000, 2),
+            "p95_le_ms": None if p95 == float("inf") else round(p95 * 1000, 2),
+        }
+    return dict(sorted(nodes.items(), key=lambda item: -item[1]["mean_ms"]))
+
+
+class LoadTest:
+    def __init__(self, client, users, args):
+        self.client = client
+        self.users = users
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    # One request of the given kind; returns the HTTP response
+    async def send(self, kind):
+        user = self.rng.choice(self.users)
+        text = self.rng.choice(INPUTS)
+        if kind == "agent":
+            return await self.client.post(
+                "/agent/invoke-agent",
+                json={"input_string": text, "user_id": user["user_id"], "chat_id": user["chat_id"]},
+            )
+        if kind == "test":
+            return await self.client.post(
+                "/test/invoke-agent-test",
+                json={"input_string": text, "user_id": user["user_id"], "chat_id": user["chat_id"]},
+            )
+        if kind == "writing":
+            return await self.client.post(
+                "/writing/invoke-agent-writing",
+                json={"user_id": user["user_id"], "chat_id": user["chat_id"], "doc_id": user["doc_id"]},
+            )
+        if kind == "chats":
+            return await self.client.get(f"/users/chats/user/{user['user_id']}")
+        if kind == "new_chat":
+            return await self.client.post("/users/chats", params={"user_id": user["user_id"]})
+        raise ValueError(f"Unknown request kind {kind}")
+
+    async def one(self, kind):
+        start = time.perf_counter()
+        try:
+            response = await self.send(kind)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        self.statuses.setdefault(kind, {})
+        self.statuses[kind][str(status)] = self.statuses[kind].get(str(status), 0) + 1
+        if status == 200 or status == 201:
+            self.latencies.setdefault(kind, []).append(elapsed)
+        else:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def pick(self, kinds, weights):
+        return self.rng.choices(kinds, weights)[0]
+
+    async def run(self, mix):
+        kinds, weights = list(mix), list(mix.values())
+        deadline = time.perf_counter() + self.args.duration
+        sent = 0
+
+        def more():
+            if self.args.requests:
+                return sent < self.args.requests
+            return time.perf_counter() < deadline
+
+        if self.args.rate <= 0:
+            # Closed loop: each worker waits for its response before sending again
+            async def worker():
+                nonlocal sent
+                while more():
+                    sent += 1
+                    await self.one(self.pick(kinds, weights))
+
+            await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+            return
+
+        # Open loop: Poisson arrivals, bounded in-flight requests
+        limit = asyncio.Semaphore(self.args.concurrency)
+        tasks = set()
+
+        async def guarded(kind):
+            async with limit:
+                await self.one(kind)
+
+        while more():
+            sent += 1
+            task = asyncio.create_task(guarded(self.pick(kinds, weights)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+        await asyncio.gather(*tasks)
+
+
+async def seed_users(client, count):
+    users = []
+    for i in range(count):
+        user_id = f"loadtest-{i}"
+        chat = await client.post("/users/chats", params={"user_id": user_id, "chat_name": "load test"})
+        chat.raise_for_status()
+        doc = await client.post(f"/users/upload-text/{user_id}/essay", json={"text": DOCUMENT})
+        doc.raise_for_status()
+        users.append({"user_id": user_id, "chat_id": chat.json()["chat_id"], "doc_id": doc.json()["doc_id"]})
+    return users
+
+
+async def main(args):
+    # Must be set before the app (and rag_store_qdrant) is imported
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["QDRANT_URL_KEY"] = ":memory:"
+    os.environ["ATLAS_URI"] = args.mongo_uri
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    os.environ.setdefault("FAKE_LLM_LATENCY", str(args.llm_latency))
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", str(args.llm_tokens_per_second))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join("storage", "loadtest_embedding_cache.sqlite3"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import httpx
+    from pymongo import AsyncMongoClient
+
+    from main import app
+    from services.metrics import NODE_LATENCY
+
+    mix = parse_mix(args.mix)
+    try:
+        # Runs the app lifespan (AppResources start/close) around the test
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest", timeout=args.timeout
+            ) as client:
+                users = await seed_users(client, args.users)
+
+                if args.warmup:
+                    warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+                    await LoadTest(client, users, warmup).run(mix)
+
+                test = LoadTest(client, users, args)
+                before = NODE_LATENCY.snapshot()
+                start = time.perf_counter()
+                await test.run(mix)
+                duration = time.perf_counter() - start
+                after = NODE_LATENCY.snapshot()
+    finally:
+        if not args.keep_db and args.mongo_uri != ":memory:":
+            mongo = AsyncMongoClient(args.mongo_uri)
+            await mongo.drop_database(args.db_name)
+            await mongo.close()
+
+    all_latencies = [v for values in test.latencies.values() for v in values]
+    report = {
+        "config": {
+            "duration_s": round(duration, 2),
+            "concurrency": args.concurrency,
+            "rate": args.rate or "closed-loop",
+            "mix": mix,
+            "users": args.users,
+            "llm_latency_s": float(os.environ["FAKE_LLM_LATENCY"]),
+            "llm_tokens_per_second": float(os.environ["FAKE_LLM_TOKENS_PER_SECOND"]),
+        },
+        "overall": {
+            **summarize(all_latencies, duration),
+            "errors": sum(test.errors.values()),
+        },
+        "endpoints": {
+            kind: {
+                **summarize(test.latencies.get(kind, []), duration),
+                "errors": test.errors.get(kind, 0),
+                "statuses": test.statuses.get(kind, {}),
+            }
+            for kind in mix
+        },
+        "nodes": node_breakdown(before, after, NODE_LATENCY.buckets),
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the agent and chat endpoints")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Workers (closed loop) or max in flight (open loop)")
+    parser.add_argument("--rate", type=float, default=0, help="Arrival rate in req/s; 0 for closed loop")
+    parser.add_argument("--mix", default="agent=4,test=1,writing=1,chats=2", help="Weighted request kinds: agent,test,writing,chats,new_chat")
+    parser.add_argument("--users", type=int, default=20, help="Distinct users/chats to spread requests over")
+    parser.add_argument("--warmup", type=int, default=20, help="Requests sent before measuring")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM time to first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50, help="Fake LLM streaming rate; 0 = instant")
+    parser.add_argument(
+        "--mongo-uri",
+        default=os.environ.get("LOADTEST_MONGO_URI", ":memory:"),
+        help="Mongo to run against; :memory: (default) for an in-process stand-in",
+    )
+    parser.add_argument("--db-name", default=f"language_app_loadtest_{uuid.uuid4().hex[:8]}")
+    parser.add_argument("--keep-db", action="store_true", help="Don't drop the load test database")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -1,31 +1,41 @@
 from dotenv import load_dotenv
 import uvicorn
+import logging
 import os
-from fastapi import FastAPI
-from pymongo import MongoClient
-from gridfs import GridFS
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 # from api import agents, rag, users
-from api import users, agents, testingAgent, writingAgent
+from api import users, agents, testingAgent, writingAgent, usage
+from api.resources import AppResources
+from services.admission import AdmissionRejected
+from services.providers import DeadlineExceeded
+from services.logging_setup import configure_logging
+from services.metrics import CONTENT_TYPE, ERRORS, REGISTRY, REQUEST_LATENCY
 from fastapi.middleware.cors import CORSMiddleware
 
+# Queue-based logging for the whole process (LOG_LEVEL, LOG_PAYLOAD_SAMPLE_RATE)
+configure_logging()
+logger = logging.getLogger(__name__)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # client = MongoClient("ATLAS_URI")
     load_dotenv()  # loads .env in working directory or parent dirs
     ATLAS_URI = os.environ.get("ATLAS_URI", "mongodb://localhost:27017")
-    print("Connecting to MongoDB at:", ATLAS_URI)
-    client = MongoClient(ATLAS_URI)
-    db = client["language_app"]
-    fs = GridFS(db)
+    logger.info("Connecting to MongoDB")
+    resources = AppResources(ATLAS_URI)
+    await resources.start()
 
-    app.state.db = db
-    app.state.fs = fs
+    app.state.resources = resources
+    app.state.db = resources.db
+    app.state.fs = resources.fs
 
     try:
         yield
     finally:
-        client.close()
+        await resources.close()
 
 app = FastAPI(title="LangTutor API" , lifespan=lifespan)
 app.add_middleware(
@@ -35,17 +45,60 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Per-endpoint latency, labelled with the route template rather than the raw path.
+# For streaming endpoints this measures time to the first byte.
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=path,
+            status=status,
+        )
+        if status >= 500:
+            ERRORS.inc(component="http", name=path)
+
+# Outbound LLM capacity exhausted: fail fast and tell the client when to retry
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# An LLM call (including any hedged backups) ran past LLM_DEADLINE_SECONDS
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
 # Register routers
 # app.include_router(agents.router, prefix="/agents", tags=["Agents"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(agents.router, prefix="/agent", tags=["Agent"])
 app.include_router(testingAgent.router, prefix="/test", tags=["Testing"])
 app.include_router(writingAgent.router, prefix="/writing", tags=["Writing"])
+app.include_router(usage.router, prefix="/usage", tags=["Usage"])
 
 @app.get("/")
-def health_check():
+async def health_check():
     return {"status": "up"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    request.app.state.resources.collect_metrics()
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 def main():
     HOST = os.getenv("HOST")
     PORT = int(os.getenv("PORT", "8000"))
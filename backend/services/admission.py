@@ -0,0 +1,155 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+
+from langchain_openai import ChatOpenAI
+from pydantic import Field
+
+from services.metrics import Counter, Gauge, Histogram
+
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds", "Time calls waited for an outbound slot.", ["model"]
+)
+ADMISSION_QUEUE = Gauge("admission_queue_depth", "Calls waiting for a slot.", ["model"])
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Calls holding a slot.", ["model"])
+ADMISSION_REJECTED = Counter(
+    "admission_rejected", "Calls turned away by admission control.", ["model", "reason"]
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when no slot is free and the wait queue is full or the wait timed out."""
+
+    def __init__(self, model: str, reason: str, retry_after: int):
+        super().__init__(f"{model} is at capacity ({reason}); retry in {retry_after}s")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _parse_limits(raw: str) -> dict:
+    # "gpt-5=16,gpt-5-mini=64"
+    limits = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class _Pool:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+        # Moving average of how long a call holds its slot, for Retry-After
+        self.avg_hold = 1.0
+
+
+class AdmissionController:
+    """
+    Bounds concurrent outbound calls per model.
+
+    Each model gets `limit` slots (ADMISSION_LIMITS, e.g. "gpt-5=16,gpt-5-mini=64";
+    others use ADMISSION_DEFAULT_LIMIT). Callers beyond that wait in a queue
+    of at most ADMISSION_MAX_QUEUE per model, for at most ADMISSION_MAX_WAIT
+    seconds. A full queue or an expired wait raises AdmissionRejected right
+    away, with a Retry-After estimate, instead of letting requests pile up
+    behind a saturated provider.
+    """
+
+    def __init__(self, limits=None, default_limit=None, max_queue=None, max_wait=None):
+        self.limits = (
+            limits if limits is not None
+            else _parse_limits(os.environ.get("ADMISSION_LIMITS", ""))
+        )
+        self.default_limit = default_limit or int(
+            os.environ.get("ADMISSION_DEFAULT_LIMIT", "16")
+        )
+        self.max_queue = (
+            max_queue if max_queue is not None
+            else int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+        )
+        self.max_wait = max_wait or float(os.environ.get("ADMISSION_MAX_WAIT", "10"))
+        self._pools = {}
+
+    def _pool(self, model: str) -> _Pool:
+        pool = self._pools.get(model)
+        if pool is None:
+            pool = self._pools[model] = _Pool(self.limits.get(model, self.default_limit))
+        return pool
+
+    def _retry_after(self, pool: _Pool) -> int:
+        # Time for the calls ahead of us to drain through the slots
+        return max(1, math.ceil(pool.avg_hold * (pool.waiting + 1) / pool.limit))
+
+    def _reject(self, model: str, pool: _Pool, reason: str):
+        ADMISSION_REJECTED.inc(model=model, reason=reason)
+        raise AdmissionRejected(model, reason, self._retry_after(pool))
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        pool = self._pool(model)
+        # Everyone not holding a slot yet counts against the queue
+        if pool.in_flight + pool.waiting >= pool.limit + self.max_queue:
+            self._reject(model, pool, "queue_full")
+
+        pool.waiting += 1
+        ADMISSION_QUEUE.set(pool.waiting, model=model)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(pool.semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._reject(model, pool, "timeout")
+        finally:
+            pool.waiting -= 1
+            ADMISSION_QUEUE.set(pool.waiting, model=model)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, model=model)
+
+        pool.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(pool.in_flight, model=model)
+        held = time.perf_counter()
+        try:
+            yield
+        finally:
+            pool.avg_hold = 0.8 * pool.avg_hold + 0.2 * (time.perf_counter() - held)
+            pool.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(pool.in_flight, model=model)
+            pool.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "limit": pool.limit,
+                "in_flight": pool.in_flight,
+                "waiting": pool.waiting,
+                "avg_hold_seconds": round(pool.avg_hold, 3),
+            }
+            for model, pool in self._pools.items()
+        }
+
+
+class AdmittedChatOpenAI(ChatOpenAI):
+    """ChatOpenAI whose async calls (invoke and stream) take an admission slot first."""
+
+    admission: Optional[Any] = Field(default=None, exclude=True)
+
+    async def _agenerate(self, *args, **kwargs):
+        # With streaming=True ChatOpenAI generates through _astream, which takes the slot
+        if self.admission is None or self.streaming:
+            return await super()._agenerate(*args, **kwargs)
+        async with self.admission.slot(self.model_name):
+            return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        if self.admission is None:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+            return
+        async with self.admission.slot(self.model_name):
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
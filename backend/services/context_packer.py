@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+class ContextPacker:
+    """
+    Fits the tutor prompt's context sections into per-section token budgets.
+
+    - Short-term memory always keeps the running chat summary (capped at half
+      the section budget), then the most recent messages that fit; long tutor
+      replies are truncated first.
+    - Long-term memories are taken highest score first, without duplicates.
+    - Reference chunks are taken highest score first; repeated chunks are dropped.
+
+    Token counts use tiktoken. If the encoding can't be loaded (e.g. offline)
+    counts fall back to a ~4 characters per token estimate.
+    """
+
+    def __init__(self, model="gpt-5", stm_budget=None, ltm_budget=None, refs_budget=None, max_reply_tokens=None):
+        self.stm_budget = stm_budget or int(os.environ.get("PROMPT_BUDGET_STM", "1500"))
+        self.ltm_budget = ltm_budget or int(os.environ.get("PROMPT_BUDGET_LTM", "500"))
+        self.refs_budget = refs_budget or int(
+            os.environ.get("PROMPT_BUDGET_REFS", "2000")
+        )
+        self.max_reply_tokens = max_reply_tokens or int(
+            os.environ.get("PROMPT_MAX_REPLY_TOKENS", "250")
+        )
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except Exception as e:
+            logger.warning("tiktoken unavailable for %s, estimating tokens: %s", model, e)
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is None:
+            return text[: max_tokens * 4].rstrip() + " …"
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens]).rstrip() + " …"
+
+    # Summary first, then newest messages until the budget runs out;
+    # returned in chronological order
+    def pack_short_term(self, messages: list) -> list:
+        summaries = []
+        used = 0
+        for msg in messages:
+            if msg.get("role") == "summary":
+                text = self.truncate(msg.get("text", ""), self.stm_budget // 2)
+                used += self.count(text)
+                summaries.append({**msg, "text": text})
+
+        packed = []
+        for msg in reversed(messages):
+            if msg.get("role") == "summary":
+                continue
+            text = msg.get("text", "")
+            if msg.get("role") == "system":
+                text = self.truncate(text, self.max_reply_tokens)
+            cost = self.count(text)
+            if used + cost > self.stm_budget:
+                break
+            used += cost
+            packed.append({**msg, "text": text})
+        packed.reverse()
+        return summaries + packed
+
+    def pack_long_term(self, memories: list) -> list:
+        packed = []
+        seen = set()
+        used = 0
+        for mem in sorted(memories, key=lambda m: m.get("score", 0.0), reverse=True):
+            key = _dedup_key(mem.get("text", ""))
+            if not key or key in seen:
+                continue
+            cost = self.count(mem["text"])
+            if used + cost > self.ltm_budget:
+                continue
+            seen.add(key)
+            used += cost
+            packed.append(mem)
+        return packed
+
+    def pack_references(self, docs: list) -> list:
+        packed = []
+        seen = set()
+        used = 0
+        for doc in sorted(docs, key=lambda d: d.get("score", 0.0), reverse=True):
+            key = _dedup_key(doc.get("text", ""))
+            if not key or key in seen:
+                continue
+            text = doc["text"]
+            remaining = self.refs_budget - used
+            if remaining <= 0:
+                break
+            text = self.truncate(text, remaining)
+            seen.add(key)
+            used += self.count(text)
+            packed.append(text)
+        return packed
+
+
+def _dedup_key(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().lower()
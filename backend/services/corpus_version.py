@@ -0,0 +1,49 @@
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+
+# Version stamps for the RAG collections, stored in Mongo so ingest scripts
+# and every API process agree on them. An ingest run bumps the stamp; caches
+# built from the collection compare against it and drop stale entries.
+VERSIONS_COLLECTION = "corpus_versions"
+
+logger = logging.getLogger(__name__)
+
+
+# Sync on purpose: called from the offline ingest scripts
+def bump_collection_version(db, coll_name: str) -> str:
+    version = str(uuid.uuid4())
+    db[VERSIONS_COLLECTION].update_one(
+        {"collection": coll_name},
+        {"$set": {"version": version, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    logger.info("%s is now at corpus version %s", coll_name, version)
+    return version
+
+
+class CorpusVersions:
+    """
+    Async lookup of collection version stamps for the API process.
+    Stamps are cached for `ttl` seconds, so an ingest is picked up within that window.
+    """
+
+    def __init__(self, db, ttl=None):
+        self.db = db
+        self.ttl = ttl if ttl is not None else float(os.environ.get("CORPUS_VERSION_TTL", "30"))
+        self._cached = {}
+
+    async def get(self, coll_name: str) -> str:
+        now = time.monotonic()
+        cached = self._cached.get(coll_name)
+        if cached and now - cached[1] < self.ttl:
+            return cached[0]
+
+        doc = await self.db[VERSIONS_COLLECTION].find_one(
+            {"collection": coll_name}, {"_id": 0, "version": 1}
+        )
+        version = doc["version"] if doc else "initial"
+        self._cached[coll_name] = (version, now)
+        return version
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    from services.metrics import track
+    from services.usage import record_embedding
+except ImportError:  # run as a script from the services folder
+    from metrics import track
+    from usage import record_embedding
+
+DEFAULT_CACHE_PATH = (
+    Path(__file__).resolve().parent.parent / "storage" / "embedding_cache.sqlite3"
+)
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", text or "")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in wrapper around an Embeddings instance with two cache tiers:
+    - a bounded in-process LRU
+    - a persistent SQLite store on disk shared by the server and ingest scripts
+
+    Entries are keyed by model name + hash of the NFC-normalized text.
+    """
+
+    def __init__(self, embeddings, model: str, path=None, max_entries=None):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries or int(
+            os.environ.get("EMBEDDING_CACHE_SIZE", "10000")
+        )
+        self.path = Path(path or os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH))
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        # Optional AdmissionController for async upstream calls, set by the API
+        self.admission = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{digest}"
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    # Resolve as many texts as possible from memory, then disk.
+    # Returns the found vectors and the (key, text) pairs still missing.
+    def _lookup(self, texts):
+        found = {}
+        missing = {}
+        with self._lock:
+            for text in texts:
+                key = self._key(text)
+                if key in found or key in missing:
+                    continue
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    self._hits_memory += 1
+                    found[key] = vector
+                else:
+                    missing[key] = text
+
+            keys = list(missing)
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f", blob).tolist()
+                    self._remember(key, vector)
+                    self._hits_disk += 1
+                    found[key] = vector
+                    missing.pop(key, None)
+
+            self._misses += len(missing)
+        return found, missing
+
+    def _store(self, keys, vectors):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [
+                    (key, array("f", vector).tobytes())
+                    for key, vector in zip(keys, vectors)
+                ],
+            )
+            self._conn.commit()
+
+    def embed_documents(self, texts):
+        texts = [normalize_text(t) for t in texts]
+        found, missing = self._lookup(texts)
+        if missing:
+            keys = list(missing)
+            with track("openai", "embeddings"):
+                vectors = self.embeddings.embed_documents([missing[k] for k in keys])
+            record_embedding(self.model, list(missing.values()))
+            vectors = [[float(x) for x in v] for v in vectors]
+            self._store(keys, vectors)
+            found.update(zip(keys, vectors))
+        return [found[self._key(t)] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        texts = [normalize_text(t) for t in texts]
+        # SQLite reads/writes run in a worker thread, off the event loop
+        found, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            keys = list(missing)
+            vectors = await self._aembed_upstream([missing[k] for k in keys])
+            record_embedding(self.model, list(missing.values()))
+            vectors = [[float(x) for x in v] for v in vectors]
+            await asyncio.to_thread(self._store, keys, vectors)
+            found.update(zip(keys, vectors))
+        return [found[self._key(t)] for t in texts]
+
+    async def _aembed_upstream(self, texts):
+        if self.admission is None:
+            with track("openai", "embeddings"):
+                return await self.embeddings.aembed_documents(texts)
+        async with self.admission.slot(self.model):
+            with track("openai", "embeddings"):
+                return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits_memory + self._hits_disk + self._misses
+            return {
+                "model": self.model,
+                "memory_hits": self._hits_memory,
+                "disk_hits": self._hits_disk,
+                "misses": self._misses,
+                "hit_rate": (
+                    (self._hits_memory + self._hits_disk) / lookups if lookups else 0.0
+                ),
+                "memory_entries": len(self._lru),
+            }
@@ -0,0 +1,127 @@
+import asyncio
+
+import mongomock
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+# ATLAS_URI=":memory:" swaps the async Mongo client and GridFS for the
+# in-process stand-ins below (see AppResources), like QDRANT_URL_KEY=":memory:"
+# does for Qdrant. Data lives for the life of the process; meant for offline
+# runs (load_test.py) and tests, not for serving users.
+
+
+class FakeAsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeAsyncCollection:
+    """
+    Async facade over a mongomock collection with the AsyncCollection call
+    shapes the app uses: find() returns a cursor right away, aggregate() and
+    every other method are awaited.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return FakeAsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline, **kwargs):
+        return FakeAsyncCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            # Yield like a real round trip so concurrent requests interleave
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        return call
+
+
+class FakeAsyncDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.name = db.name
+
+    def __getitem__(self, name):
+        return FakeAsyncCollection(self._db[name])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakeAsyncMongoClient:
+    def __init__(self, uri=None, **kwargs):
+        self._client = mongomock.MongoClient()
+
+    def __getitem__(self, name):
+        return FakeAsyncDatabase(self._client[name])
+
+    async def drop_database(self, name):
+        self._client.drop_database(name)
+
+    async def close(self):
+        pass
+
+
+class _GridOut:
+    def __init__(self, doc):
+        self._id = doc["_id"]
+        self.filename = doc.get("filename")
+        self._data = doc["data"]
+
+    async def read(self):
+        return self._data
+
+
+class FakeAsyncGridFS:
+    """Whole files in one document each; enough for put/get/delete."""
+
+    def __init__(self, db, collection="fs"):
+        self._files = db[f"{collection}.files"]
+
+    async def put(self, data, **kwargs):
+        file_id = kwargs.pop("_id", None) or ObjectId()
+        await self._files.insert_one({"_id": file_id, "data": bytes(data), **kwargs})
+        return file_id
+
+    async def get(self, file_id):
+        doc = await self._files.find_one({"_id": file_id})
+        if doc is None:
+            raise NoFile(f"no file in GridFS with _id {file_id!r}")
+        return _GridOut(doc)
+
+    async def delete(self, file_id):
+        await self._files.delete_one({"_id": file_id})
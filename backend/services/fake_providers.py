@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import unicodedata
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+# LLM_PROVIDER=fake swaps every chat model and embedder for the ones below
+# and defaults Qdrant to an in-memory instance (see rag_store_qdrant.py).
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai").lower()
+
+
+def fake_providers_enabled() -> bool:
+    return LLM_PROVIDER == "fake"
+
+
+_TUTOR_LINES = [
+    "Xin chào! In Vietnamese, 'xin chào' is a polite greeting you can use with anyone.",
+    "Good question. 'Cảm ơn' means 'thank you'; add 'nhiều' to say 'thank you very much'.",
+    "Remember the tones: 'ma' (ghost), 'má' (mother), 'mà' (but), 'mả' (tomb), 'mã' (horse), 'mạ' (rice seedling).",
+    "Try this sentence: 'Tôi muốn uống cà phê sữa đá' — I want to drink iced milk coffee.",
+    "Nice work! 'Bạn khỏe không?' asks 'How are you?'; answer with 'Tôi khỏe, cảm ơn'.",
+    "In Vietnamese, adjectives follow the noun: 'nhà lớn' means 'big house'.",
+    "Use 'đã' before a verb for the past and 'sẽ' for the future: 'Tôi sẽ đi Hà Nội'.",
+    "Numbers one to five are 'một, hai, ba, bốn, năm'. Can you count to ten?",
+]
+
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for message in messages:
+        content = message.content
+        if isinstance(content, list):
+            content = " ".join(
+                part.get("text", "") if isinstance(part, dict) else str(part)
+                for part in content
+            )
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+def fake_reply(prompt: str, words: int) -> str:
+    """
+    Deterministic reply for a prompt, shaped like what the calling code parses:
+    quiz, writing and memory-classifier prompts get schema-valid JSON.
+    """
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+    if '"questions"' in prompt:
+        return json.dumps(
+            {
+                "questions": [
+                    {
+                        "question": f"Does '{word}' mean '{meaning}' in Vietnamese?",
+                        "answer": rng.choice(["yes", "no"]),
+                        "explanation": f"'{word}' is commonly translated as '{meaning}'.",
+                    }
+                    for word, meaning in rng.sample(
+                        [
+                            ("xin chào", "hello"),
+                            ("cảm ơn", "thank you"),
+                            ("tạm biệt", "goodbye"),
+                            ("nước", "water"),
+                            ("cà phê", "coffee"),
+                            ("bạn", "friend"),
+                        ],
+                        3,
+                    )
+                ]
+            },
+            ensure_ascii=False,
+        )
+
+    if '"suggestions"' in prompt:
+        return json.dumps(
+            {
+                "suggestions": [
+                    {
+                        "category_label": label,
+                        "suggestion": f"Check the {label} here: {rng.choice(_TUTOR_LINES)}",
+                    }
+                    for label in rng.sample(["grammar", "spelling", "tone", "formality"], 2)
+                ]
+            },
+            ensure_ascii=False,
+        )
+
+    if '"results"' in prompt and "Turns:" in prompt:
+        turns = re.findall(r"^\s*\[(\d+)\]\s*$", prompt, flags=re.MULTILINE)
+        return json.dumps(
+            {
+                "results": [
+                    {
+                        "index": int(index),
+                        "category": rng.choice(["troubled", "known", "misc"]),
+                        "summary": f"Practised {rng.choice(['greetings', 'tones', 'numbers', 'ordering food'])}.",
+                    }
+                    for index in turns
+                ]
+            }
+        )
+
+    if "CURRENT_SUMMARY" in prompt:
+        return "The user practised greetings and tones; the tutor corrected a few tone marks."
+
+    # Tutor turn: canned lines padded to roughly `words` words
+    text = []
+    while len(text) < words:
+        text.extend(rng.choice(_TUTOR_LINES).split())
+    return " ".join(text[:words])
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI with a configurable latency profile.
+
+    Waits `latency` seconds before the first token, then streams the reply
+    word by word at `tokens_per_second` (0 = no delay). Replies are
+    deterministic per prompt (see fake_reply) and carry usage_metadata, so
+    usage accounting and streaming behave as with the real model.
+    Extra call kwargs such as response_format are accepted and ignored.
+    """
+
+    model_name: str = "fake-chat"
+    latency: float = 0.3
+    tokens_per_second: float = 50.0
+    reply_words: int = 60
+
+    @classmethod
+    def from_env(cls, model_name: str = "fake-chat", **kwargs):
+        return cls(
+            model_name=model_name,
+            latency=float(os.environ.get("FAKE_LLM_LATENCY", "0.3")),
+            tokens_per_second=float(os.environ.get("FAKE_LLM_TOKENS_PER_SECOND", "50")),
+            reply_words=int(os.environ.get("FAKE_LLM_REPLY_WORDS", "60")),
+            **kwargs,
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _chunks(self, messages):
+        prompt = _prompt_text(messages)
+        tokens = re.findall(r"\s*\S+", fake_reply(prompt, self.reply_words))
+        for token in tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Final chunk carries usage, like OpenAI's stream_usage
+        input_tokens = max(1, len(prompt) // 4)
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": input_tokens,
+                    "output_tokens": len(tokens),
+                    "total_tokens": input_tokens + len(tokens),
+                },
+                response_metadata={"model_name": self.model_name},
+            )
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if chunk.message.content and self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            if chunk.message.content and self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield chunk
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop=stop, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic offline embedder: hashes words and character trigrams of
+    the folded text into a fixed-size vector (signed feature hashing),
+    L2-normalized. Texts sharing words land close together, so retrieval
+    and memory compaction behave plausibly without any network call.
+    """
+
+    def __init__(self, size: int = 1536):
+        self.size = size
+
+    def _features(self, text: str):
+        text = unicodedata.normalize("NFC", (text or "").lower())
+        words = re.findall(r"\w+", text)
+        for word in words:
+            yield "w:" + word
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i : i + 3]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.size] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    # Pure CPU and cheap: no executor hop
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+# A few lessons/test plans so the RAG nodes have something to retrieve
+_SEED_CHUNKS = [
+    "Lesson 1: Greetings. Xin chào (hello), tạm biệt (goodbye), bạn khỏe không? (how are you?).",
+    "Lesson 2: Pronouns. Tôi (I), bạn (you), anh/chị/em depend on age and relationship.",
+    "Lesson 3: Tones. Vietnamese has six tones: ngang, huyền, sắc, hỏi, ngã, nặng.",
+    "Lesson 4: Numbers. Một, hai, ba, bốn, năm, sáu, bảy, tám, chín, mười.",
+    "Lesson 5: Ordering food. Cho tôi một tô phở (a bowl of pho, please). Tính tiền (the bill).",
+    "Lesson 6: Past and future. Đã marks the past, đang the present, sẽ the future.",
+    "Lesson 7: Questions. Không at the end makes a yes/no question: Bạn có đói không?",
+    "Lesson 8: Directions. Rẽ trái (turn left), rẽ phải (turn right), đi thẳng (go straight).",
+]
+
+
+async def seed_local_corpus(qdrant, embeddings, collections):
+    """Creates and fills the RAG collections of an empty in-memory Qdrant."""
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    vectors = await embeddings.aembed_documents(_SEED_CHUNKS)
+    for name in collections:
+        if await qdrant.collection_exists(name):
+            continue
+        await qdrant.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(size=len(vectors[0]), distance=Distance.COSINE),
+        )
+        await qdrant.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(
+                    id=i + 1,
+                    vector=vector,
+                    payload={"text": text, "lesson_index": i + 1},
+                )
+                for i, (text, vector) in enumerate(zip(_SEED_CHUNKS, vectors))
+            ],
+        )
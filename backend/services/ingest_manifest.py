@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+# Mongo collection holding MongoIngestManifest entries, next to corpus_versions
+MANIFESTS_COLLECTION = "ingest_manifests"
+
+# Fixed namespace so chunk ids are the same on every machine and run
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2f4e-3b1a-5d7e-9a55-2c8e4b0d7a10")
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(key, text: str) -> str:
+    """Stable id for a chunk from where it sits (`key`) and its text."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{key}:{text_sha256(text)}"))
+
+
+class IngestManifest:
+    """
+    Record of what an ingest run put into one vector collection: for every
+    source file its content hash, the lesson_index of its first page, its
+    page count and the ids of the chunks it produced.
+
+    Ingest compares each file against its entry: a file with the same hash
+    (and the same first lesson, since lesson_index runs across files) is
+    skipped without parsing; a changed file only has its new chunk ids
+    embedded and upserted, and its vanished ids deleted; files missing from
+    the directory have all their ids deleted. The manifest is written only
+    after a run succeeds, so an interrupted run is simply redone.
+
+    A manifest written for another embedding model is ignored (full rebuild).
+
+    Kept as a JSON file at `path`, which only suits a store on the same disk
+    (the FAISS index); shared collections use MongoIngestManifest.
+    """
+
+    def __init__(self, path, model: str):
+        self.path = Path(path)
+        self.model = model
+        self.files = {}
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION and data.get("model") == model:
+                self.files = data.get("files", {})
+            else:
+                print(f"[INGEST] Ignoring manifest {self.path} (other version or model)")
+
+    def reset(self):
+        self.files = {}
+
+    def entry(self, source: str):
+        return self.files.get(source)
+
+    def is_current(self, source: str, sha256: str, first_lesson=None) -> bool:
+        entry = self.files.get(source)
+        return (
+            entry is not None
+            and entry["sha256"] == sha256
+            and entry.get("first_lesson") == first_lesson
+        )
+
+    def ids(self, source: str) -> set:
+        entry = self.files.get(source)
+        return set(entry["ids"]) if entry else set()
+
+    def all_ids(self) -> set:
+        return {id for entry in self.files.values() for id in entry["ids"]}
+
+    def record(self, source: str, sha256: str, ids, pages: int, first_lesson=None):
+        self.files[source] = {
+            "sha256": sha256,
+            "first_lesson": first_lesson,
+            "pages": pages,
+            "ids": list(dict.fromkeys(ids)),
+        }
+
+    # Drops the entries of files that are gone; returns their ids
+    def forget_missing(self, sources) -> list:
+        removed = []
+        for source in set(self.files) - set(sources):
+            removed.extend(self.files.pop(source)["ids"])
+        return removed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "model": self.model, "files": self.files},
+                f,
+                indent=1,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self.path)
+
+
+class MongoIngestManifest(IngestManifest):
+    """
+    IngestManifest for a shared vector collection (cloud Qdrant), stored in
+    Mongo with one document per source file, so every machine and container
+    ingesting into the collection works from the same record and can delete
+    the points of files removed elsewhere.
+
+    Sync on purpose: used by the offline ingest scripts.
+    """
+
+    def __init__(self, db, coll_name: str, model: str):
+        self.collection = db[MANIFESTS_COLLECTION]
+        self.coll_name = coll_name
+        self.model = model
+        self.files = {}
+        # Sources recorded this run; only these are written back
+        self._changed = set()
+
+        self.collection.create_index([("collection", 1), ("source", 1)], unique=True)
+        ignored = 0
+        for doc in self.collection.find({"collection": coll_name}, {"_id": 0}):
+            if doc.get("version") == MANIFEST_VERSION and doc.get("model") == model:
+                self.files[doc["source"]] = {
+                    key: doc[key] for key in ("sha256", "first_lesson", "pages", "ids")
+                }
+            else:
+                ignored += 1
+        if ignored:
+            print(f"[INGEST] Ignoring {ignored} manifest entries of {coll_name} (other version or model)")
+
+    def record(self, source: str, sha256: str, ids, pages: int, first_lesson=None):
+        super().record(source, sha256, ids, pages, first_lesson)
+        self._changed.add(source)
+
+    def save(self):
+        for source in sorted(self._changed & set(self.files)):
+            self.collection.replace_one(
+                {"collection": self.coll_name, "source": source},
+                {
+                    "collection": self.coll_name,
+                    "source": source,
+                    "version": MANIFEST_VERSION,
+                    "model": self.model,
+                    **self.files[source],
+                },
+                upsert=True,
+            )
+        # Files that are gone, plus entries left by another model/version
+        self.collection.delete_many(
+            {"collection": self.coll_name, "source": {"$nin": list(self.files)}}
+        )
+        self._changed.clear()
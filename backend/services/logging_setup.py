@@ -0,0 +1,81 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+_listener = None
+
+
+class PayloadSampler(logging.Filter):
+    """
+    Lets through only a sample of verbose payload records (prompt context,
+    references, message dumps). Mark them with extra={"payload": True};
+    everything else passes untouched.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, "payload", False):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+def configure_logging(level=None, payload_sample_rate=None):
+    """
+    Sets up process-wide logging once.
+
+    Records are formatted and written by a QueueListener thread; the calling
+    code (including the event loop) only enqueues them, so a slow stdout or
+    log collector never blocks request handling.
+
+    LOG_LEVEL sets the level (default INFO). LOG_PAYLOAD_SAMPLE_RATE (0-1,
+    default 0.01) controls how many payload records are kept; payload logs are
+    emitted at DEBUG, so they only show with LOG_LEVEL=DEBUG.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = level or os.environ.get("LOG_LEVEL", "INFO").upper()
+    rate = (
+        payload_sample_rate
+        if payload_sample_rate is not None
+        else float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+    )
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    log_queue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(log_queue)
+    # Drop unsampled payloads before they are formatted or queued
+    handler.addFilter(PayloadSampler(rate))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    # httpx logs one INFO line per OpenAI request; keep those for DEBUG runs
+    if root.getEffectiveLevel() > logging.DEBUG:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, stream, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flushes queued records and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import logging
+import os
+
+import numpy as np
+from qdrant_client.http.models import FieldCondition, Filter, MatchValue, PointIdsList
+
+from services.logging_setup import configure_logging
+from services.memory_store import MEMORY_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCompactor:
+    """
+    Merges near-duplicate long-term memories of each user.
+
+    A user's points are grouped per category and clustered greedily by cosine
+    similarity (>= threshold), newest first. Each cluster collapses into its
+    newest point, which keeps its summary and vector and gets:
+      - count: how many memories it now stands for
+      - first_seen / last_seen: the oldest and newest created_at in the cluster
+    The other points are deleted. The survivor is updated before anything is
+    deleted, so an interrupted run never loses a memory.
+
+    Runs from the CLI (python -m services.memory_compaction) or on a timer in
+    the API process (see start/stop).
+    """
+
+    def __init__(self, qdrant, collection=MEMORY_COLLECTION, threshold=None, interval=None):
+        self.qdrant = qdrant
+        self.collection = collection
+        self.threshold = threshold or float(
+            os.environ.get("MEMORY_COMPACTION_THRESHOLD", "0.92")
+        )
+        # Seconds between scheduled runs; 0 disables the background task
+        self.interval = (
+            interval
+            if interval is not None
+            else float(os.environ.get("MEMORY_COMPACTION_INTERVAL", "21600"))
+        )
+        self._task = None
+
+    async def _scroll(self, scroll_filter=None, with_vectors=False, payload=True):
+        points = []
+        offset = None
+        while True:
+            batch, offset = await self.qdrant.scroll(
+                collection_name=self.collection,
+                scroll_filter=scroll_filter,
+                with_vectors=with_vectors,
+                with_payload=payload,
+                limit=256,
+                offset=offset,
+            )
+            points.extend(batch)
+            if offset is None:
+                return points
+
+    async def user_ids(self) -> list:
+        points = await self._scroll(payload=["user_id"])
+        return sorted({p.payload["user_id"] for p in points if p.payload.get("user_id")})
+
+    def _clusters(self, points: list) -> list:
+        points = sorted(
+            points,
+            key=lambda p: p.payload.get("last_seen") or p.payload.get("created_at") or "",
+            reverse=True,
+        )
+        vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+        assigned = np.zeros(len(points), dtype=bool)
+        clusters = []
+        for i in range(len(points)):
+            if assigned[i]:
+                continue
+            members = np.flatnonzero(~assigned & (vectors @ vectors[i] >= self.threshold))
+            assigned[members] = True
+            clusters.append([points[j] for j in members])
+        return clusters
+
+    async def compact_user(self, user_id: str) -> int:
+        points = await self._scroll(
+            scroll_filter=Filter(
+                must=[FieldCondition(key="user_id", match=MatchValue(value=user_id))]
+            ),
+            with_vectors=True,
+        )
+
+        by_category = {}
+        for point in points:
+            category = str(point.payload.get("category", "misc")).lower()
+            by_category.setdefault(category, []).append(point)
+
+        removed = 0
+        for category_points in by_category.values():
+            for cluster in self._clusters(category_points):
+                if len(cluster) < 2:
+                    continue
+                keep, rest = cluster[0], cluster[1:]
+                seen = [
+                    p.payload.get(field)
+                    for p in cluster
+                    for field in ("first_seen", "created_at", "last_seen")
+                    if p.payload.get(field)
+                ]
+                merged = {"count": sum(int(p.payload.get("count", 1)) for p in cluster)}
+                if seen:
+                    merged["first_seen"] = min(seen)
+                    merged["last_seen"] = max(seen)
+
+                await self.qdrant.set_payload(
+                    collection_name=self.collection, payload=merged, points=[keep.id]
+                )
+                await self.qdrant.delete(
+                    collection_name=self.collection,
+                    points_selector=PointIdsList(points=[p.id for p in rest]),
+                )
+                removed += len(rest)
+
+        if removed:
+            logger.info("User %s: merged %d of %d memories", user_id, removed, len(points))
+        return removed
+
+    async def compact_all(self) -> int:
+        removed = 0
+        for user_id in await self.user_ids():
+            removed += await self.compact_user(user_id)
+        logger.info("Removed %d duplicate memories", removed)
+        return removed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact_all()
+            except Exception as e:
+                logger.exception("Memory compaction failed: %s", e)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+async def _main(args):
+    from services.rag_store_qdrant import get_async_qdrant_client
+
+    compactor = MemoryCompactor(get_async_qdrant_client(), threshold=args.threshold)
+    if args.user_id:
+        await compactor.compact_user(args.user_id)
+    else:
+        await compactor.compact_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge near-duplicate long-term memories in Qdrant."
+    )
+    parser.add_argument("--user-id", help="only compact this user's memories")
+    parser.add_argument("--threshold", type=float, help="cosine similarity to merge at")
+    configure_logging()
+    asyncio.run(_main(parser.parse_args()))
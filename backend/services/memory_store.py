@@ -0,0 +1,57 @@
+import logging
+import os
+
+from qdrant_client.models import (
+    Distance,
+    HnswConfigDiff,
+    KeywordIndexParams,
+    KeywordIndexType,
+    VectorParams,
+)
+
+logger = logging.getLogger(__name__)
+
+MEMORY_COLLECTION = "user_memories"
+# text-embedding-ada-002
+MEMORY_VECTOR_SIZE = int(os.environ.get("MEMORY_VECTOR_SIZE", "1536"))
+
+# Collections already checked by this process
+_ready = set()
+
+
+async def ensure_memory_collection(qdrant, collection=MEMORY_COLLECTION):
+    """
+    Creates the long-term memory collection for multitenant use, once per process.
+
+    Every memory search filters on user_id, so the collection is set up the
+    way Qdrant recommends for per-tenant data:
+      - user_id gets a keyword payload index flagged is_tenant, which keeps
+        each user's points together on disk
+      - the global HNSW graph is disabled (m=0) and per-tenant graphs are
+        built instead (payload_m), so a filtered search only walks the
+        requesting user's graph
+    Safe to call repeatedly; an existing collection just gets the index if it
+    is missing.
+    """
+    if collection in _ready:
+        return
+
+    if not await qdrant.collection_exists(collection):
+        await qdrant.create_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(size=MEMORY_VECTOR_SIZE, distance=Distance.COSINE),
+            hnsw_config=HnswConfigDiff(payload_m=16, m=0),
+        )
+        logger.info("Created collection %s", collection)
+
+    info = await qdrant.get_collection(collection)
+    if "user_id" not in (info.payload_schema or {}):
+        await qdrant.create_payload_index(
+            collection_name=collection,
+            field_name="user_id",
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+            wait=True,
+        )
+        logger.info("Created tenant index on %s.user_id", collection)
+
+    _ready.add(collection)
@@ -0,0 +1,247 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_PATH = (
+    Path(__file__).resolve().parent.parent / "storage" / "memory_spool.sqlite3"
+)
+
+
+class MemoryWriter:
+    """
+    Background writer for the slow follow-up work of finished chat turns
+    (the tutor uses it for memory extraction; chat history is written
+    before the response, see ManagerAgent.update_memory).
+
+    Jobs are written to a local SQLite spool before submit() returns. A single
+    asyncio task collects them into micro-batches (up to batch_size jobs, or
+    whatever arrived within batch_window seconds of the first one) and awaits
+    the handler with each batch as a list. Batches are processed in submission
+    order, so turns of the same chat stay ordered.
+
+    A failing batch is retried with backoff. If it still fails, its jobs are
+    retried one at a time so a single bad turn can't sink the rest. A job that
+    fails on its own parks its chat: it and every later job of that chat wait
+    in the spool, and the head job is retried every parked_retry seconds until
+    it goes through, so a chat's turns are never written past a gap. Other
+    chats keep flowing. Anything unfinished at shutdown, parked jobs included,
+    is replayed on the next start.
+    """
+
+    def __init__(
+        self,
+        handler,
+        path=None,
+        batch_size=None,
+        batch_window=None,
+        max_attempts=None,
+        retry_delay=None,
+        parked_retry=None,
+    ):
+        self.handler = handler
+        self.path = Path(path or os.environ.get("MEMORY_SPOOL_PATH", DEFAULT_SPOOL_PATH))
+        self.batch_size = batch_size or int(os.environ.get("MEMORY_BATCH_SIZE", "16"))
+        self.batch_window = batch_window or float(
+            os.environ.get("MEMORY_BATCH_WINDOW", "0.5")
+        )
+        self.max_attempts = max_attempts or int(
+            os.environ.get("MEMORY_WRITER_MAX_ATTEMPTS", "5")
+        )
+        self.retry_delay = retry_delay or float(
+            os.environ.get("MEMORY_WRITER_RETRY_DELAY", "1.0")
+        )
+        self.parked_retry = parked_retry or float(
+            os.environ.get("MEMORY_WRITER_PARKED_RETRY", "30")
+        )
+
+        self._queue = None
+        self._task = None
+        # chat_id -> its unwritten jobs, oldest (the failing one) first
+        self._parked = {}
+        self._parked_retry_at = None
+        # Spool access runs in worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _execute(self, sql, params=(), many=False):
+        with self._lock:
+            if many:
+                cur = self._conn.executemany(sql, params)
+            else:
+                cur = self._conn.execute(sql, params)
+            rows = cur.fetchall()
+            self._conn.commit()
+            return cur.lastrowid, rows
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+
+        # Replay jobs left over from a previous run, oldest first, including
+        # the ones that kept failing (e.g. through a long Mongo outage)
+        _, rows = await asyncio.to_thread(
+            self._execute, "SELECT id, payload FROM jobs ORDER BY id"
+        )
+        for job_id, payload in rows:
+            self._queue.put_nowait((job_id, json.loads(payload)))
+        if rows:
+            logger.info("Replaying %d spooled memory jobs", len(rows))
+
+        self._task = asyncio.create_task(self._run(), name="memory-writer")
+
+    async def submit(self, job: dict):
+        job_id, _ = await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (chat_id, payload) VALUES (?, ?)",
+            (job["chat_id"], json.dumps(job)),
+        )
+        self._queue.put_nowait((job_id, job))
+        return job_id
+
+    def pending(self) -> int:
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + sum(len(items) for items in self._parked.values())
+
+    # Waits for the first job (or until parked chats are due a retry), then
+    # keeps collecting until the batch is full or the window closes.
+    # Returns (batch, stop_requested).
+    async def _next_batch(self):
+        timeout = None
+        if self._parked:
+            timeout = max(0.0, self._parked_retry_at - time.monotonic())
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return [], False
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        while True:
+            batch, stop = await self._next_batch()
+            if stop:
+                await self._write(batch)
+                if self._parked:
+                    logger.warning(
+                        "%d memory jobs of parked chats left in spool at %s",
+                        self.pending(),
+                        self.path,
+                    )
+                return
+            if self._parked and time.monotonic() >= self._parked_retry_at:
+                await self._retry_parked()
+            await self._write(batch)
+
+    async def _write(self, batch):
+        # Jobs of a parked chat queue up behind its failing job
+        ready = []
+        for item in batch:
+            if item[1]["chat_id"] in self._parked:
+                self._parked[item[1]["chat_id"]].append(item)
+            else:
+                ready.append(item)
+        if not ready or await self._attempt(ready, self.max_attempts):
+            return
+
+        for item in ready:
+            chat_id = item[1]["chat_id"]
+            if chat_id in self._parked:
+                self._parked[chat_id].append(item)
+            elif not await self._attempt([item], 1):
+                logger.error(
+                    "Job %s failed; parking chat %s until it goes through", item[0], chat_id
+                )
+                if not self._parked:
+                    self._parked_retry_at = time.monotonic() + self.parked_retry
+                self._parked[chat_id] = [item]
+
+    # One attempt at the head job of every parked chat; a chat whose head
+    # goes through writes its queued jobs in order and is released
+    async def _retry_parked(self):
+        for chat_id in list(self._parked):
+            items = self._parked[chat_id]
+            while items and await self._attempt(items[:1], 1):
+                items.pop(0)
+            if not items:
+                del self._parked[chat_id]
+                logger.info("Memory writes for chat %s caught up", chat_id)
+        self._parked_retry_at = time.monotonic() + self.parked_retry
+
+    async def _attempt(self, batch, attempts) -> bool:
+        ids = [(job_id,) for job_id, _ in batch]
+        for attempt in range(1, attempts + 1):
+            try:
+                await self.handler([job for _, job in batch])
+            except Exception as e:
+                logger.warning(
+                    "Batch of %d jobs failed (attempt %d/%d): %s",
+                    len(batch),
+                    attempt,
+                    attempts,
+                    e,
+                )
+                await asyncio.to_thread(
+                    self._execute,
+                    "UPDATE jobs SET attempts = attempts + 1 WHERE id = ?",
+                    ids,
+                    True,
+                )
+                if attempt < attempts:
+                    await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+                continue
+
+            await asyncio.to_thread(
+                self._execute, "DELETE FROM jobs WHERE id = ?", ids, True
+            )
+            return True
+        return False
+
+    # Lets queued jobs drain; whatever is still running after the timeout
+    # stays in the spool and is replayed by the next start()
+    async def stop(self, timeout: float = 10.0):
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            logger.warning("Memory writer did not drain in time; pending jobs stay spooled")
+            # Interrupted jobs aren't deleted from the spool, so nothing is lost
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
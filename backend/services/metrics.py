@@ -0,0 +1,244 @@
+import abc
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Seconds; covers cache hits (ms) through full LLM turns (tens of seconds)
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self):
+        """[(name suffix, label values, extra labels, value), ...] for render()."""
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, values, extra, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_labels(self.labelnames, values, extra)} {_number(value)}"
+            )
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    # Mirrors a count that is tracked elsewhere (e.g. cache stats())
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            return [("_total", k, (), v) for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            return [("", k, (), v) for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            else:
+                state[0][-1] += 1
+            state[1] += value
+
+    # Usable around sync and async code alike
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        """{label values: (cumulative bucket counts, count, sum)} for reporting."""
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._values.items()]
+        result = {}
+        for key, counts, total in items:
+            cumulative = []
+            running = 0
+            for c in counts:
+                running += c
+                cumulative.append(running)
+            result[key] = (cumulative, running, total)
+        return result
+
+    def samples(self):
+        samples = []
+        bounds = list(self.buckets) + [float("inf")]
+        for key, (cumulative, count, total) in sorted(self.snapshot().items()):
+            for bound, value in zip(bounds, cumulative):
+                samples.append(("_bucket", key, (("le", _number(bound)),), value))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+NODE_LATENCY = Histogram(
+    "graph_node_duration_seconds", "Time spent in each LangGraph node.", ["graph", "node"]
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_duration_seconds",
+    "Time spent in calls to external services.",
+    ["dependency", "operation"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per endpoint.",
+    ["method", "route", "status"],
+)
+ERRORS = Counter("errors", "Failures by component.", ["component", "name"])
+
+CACHE_HITS = Counter("cache_hits", "Cache hits.", ["cache"])
+CACHE_MISSES = Counter("cache_misses", "Cache misses.", ["cache"])
+CACHE_ENTRIES = Gauge("cache_entries", "Entries currently held in memory.", ["cache"])
+ROUTED_TURNS = Counter(
+    "routed_turns", "Tutor turns per model tier and routing reason.", ["route", "reason"]
+)
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests", "Requests served by an identical in-flight call.", ["endpoint"]
+)
+FIRST_TOKEN_LATENCY = Histogram(
+    "llm_first_token_seconds", "Time to first streamed token per provider.", ["provider"]
+)
+HEDGED_CALLS = Counter(
+    "llm_hedged_calls", "Hedged LLM calls by which attempt answered.", ["outcome"]
+)
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Tokens in each tutor prompt, per route.",
+    ["route"],
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000),
+)
+MEMORY_WRITER_PENDING = Gauge(
+    "memory_writer_pending_jobs", "Turns queued in the memory writer."
+)
+
+
+def track(dependency: str, operation: str):
+    """Times one call to an external service: `with track("openai", "chat"): ...`"""
+    return DEPENDENCY_LATENCY.time(dependency=dependency, operation=operation)
+
+
+def timed_node(graph: str, node: str, fn):
+    """Wraps an async graph node so its duration and failures are recorded."""
+
+    @functools.wraps(fn)
+    async def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return await fn(state)
+        except Exception:
+            ERRORS.inc(component=graph, name=node)
+            raise
+        finally:
+            NODE_LATENCY.observe(time.perf_counter() - start, graph=graph, node=node)
+
+    # LangGraph inspects the node signature; expose only (state)
+    del wrapper.__wrapped__
+    return wrapper
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records every Mongo command's server round trip (pass via event_listeners)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        DEPENDENCY_LATENCY.observe(
+            event.duration_micros / 1e6, dependency="mongo", operation=event.command_name
+        )
+
+    def failed(self, event):
+        DEPENDENCY_LATENCY.observe(
+            event.duration_micros / 1e6, dependency="mongo", operation=event.command_name
+        )
+        ERRORS.inc(component="mongo", name=event.command_name)
@@ -0,0 +1,71 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pymupdf
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+# Processes parsing/chunking PDFs during ingest (CPU bound); 1 = in-process
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+
+def find_pdfs(directory):
+    # Sorted so lesson_index numbering doesn't depend on filesystem order
+    pdfs = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".pdf"):
+                pdfs.append(os.path.join(root, file))
+    return sorted(pdfs)
+
+
+def page_count(pdf) -> int:
+    # Reads the page tree only; much cheaper than extracting text
+    with pymupdf.open(pdf) as doc:
+        return doc.page_count
+
+
+def split_pdf(pdf):
+    """
+    Parses one PDF page by page and chunks each page.
+    Returns one list of chunk Documents per page, in page order.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    pages = []
+    for doc in PyMuPDFLoader(pdf).lazy_load():
+        if doc.metadata is None:
+            doc.metadata = {}
+        pages.append(text_splitter.split_documents([doc]))
+    return pages
+
+
+def split_pdfs(pdfs, workers=None):
+    """
+    Yields split_pdf(pdf) for each of `pdfs`, in that order, parsing across a
+    process pool. At most two results per worker are parsed ahead of the
+    consumer, so memory stays bounded however many PDFs there are.
+    """
+    pdfs = list(pdfs)
+    workers = min(workers or INGEST_WORKERS, len(pdfs))
+    if workers <= 1:
+        for pdf in pdfs:
+            yield split_pdf(pdf)
+        return
+
+    remaining = iter(pdfs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque(
+            executor.submit(split_pdf, pdf) for pdf in islice(remaining, workers * 2)
+        )
+        while pending:
+            pages = pending.popleft().result()
+            pdf = next(remaining, None)
+            if pdf is not None:
+                pending.append(executor.submit(split_pdf, pdf))
+            yield pages
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from services.metrics import FIRST_TOKEN_LATENCY, HEDGED_CALLS
+
+logger = logging.getLogger(__name__)
+
+MISTRAL_MODEL = os.environ.get("MISTRAL_MODEL", "mistral-large-latest")
+ANTHROPIC_MODEL = os.environ.get("ANTHROPIC_MODEL", "claude-sonnet-4-5")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when an LLM call doesn't finish within its deadline."""
+
+
+def build_backup(name: str, callbacks=None):
+    """
+    Chat model for a backup provider, or None if it can't be used here
+    (integration package not installed or no API key configured).
+    """
+    try:
+        if name == "mistral":
+            if not os.environ.get("MISTRAL_API_KEY"):
+                return None
+            from langchain_mistralai.chat_models import ChatMistralAI
+
+            return ChatMistralAI(
+                api_key=os.environ.get("MISTRAL_API_KEY"),
+                model=MISTRAL_MODEL,
+                callbacks=callbacks,
+            )
+        if name == "anthropic":
+            if not os.environ.get("ANTHROPIC_API_KEY"):
+                return None
+            from langchain_anthropic import ChatAnthropic
+
+            return ChatAnthropic(
+                api_key=os.environ.get("ANTHROPIC_API_KEY"),
+                model=ANTHROPIC_MODEL,
+                max_tokens=2048,
+                callbacks=callbacks,
+            )
+    except ImportError as e:
+        logger.warning("Backup provider %s unavailable: %s", name, e)
+        return None
+    logger.warning("Unknown backup provider %s", name)
+    return None
+
+
+def build_backups(callbacks=None) -> list:
+    # LLM_BACKUP_PROVIDERS="mistral,anthropic", in hedging order
+    backups = []
+    for name in os.environ.get("LLM_BACKUP_PROVIDERS", "").split(","):
+        name = name.strip().lower()
+        if name:
+            model = build_backup(name, callbacks)
+            if model is not None:
+                backups.append((name, model))
+    return backups
+
+
+def _provider_name(model) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model that races providers on time to first token.
+
+    The primary is always called first. If it hasn't produced a first token
+    after the hedge delay, the next backup gets the same prompt, and so on;
+    the first attempt to produce a token wins and the others are cancelled.
+    A provider that fails before its first token is replaced by the next
+    backup straight away (failover).
+
+    The hedge delay is the p95 of the primary's recent first-token latencies
+    (clamped to [hedge_min, hedge_max]; hedge_initial until enough samples).
+    Every call has an overall deadline; exceeding it raises DeadlineExceeded.
+
+    Call kwargs (e.g. OpenAI's response_format) are passed to the primary
+    only; the prompts ask for JSON explicitly, so backups get the prompt alone.
+    Inner calls run with their own callbacks only, so graph streaming sees
+    each token once (from this model) and usage is recorded per provider.
+    """
+
+    primary: Any
+    backups: List[Any] = []
+    backup_names: List[str] = []
+    deadline: float = 60.0
+    hedge_initial: float = 2.0
+    hedge_min: float = 0.5
+    hedge_max: float = 10.0
+    min_samples: int = 20
+
+    _latencies: Any = PrivateAttr(default_factory=lambda: deque(maxlen=200))
+
+    @classmethod
+    def from_env(cls, primary, callbacks=None):
+        backups = build_backups(callbacks)
+        return cls(
+            primary=primary,
+            backups=[model for _, model in backups],
+            backup_names=[name for name, _ in backups],
+            deadline=float(os.environ.get("LLM_DEADLINE_SECONDS", "60")),
+            hedge_initial=float(os.environ.get("HEDGE_INITIAL_DELAY", "2.0")),
+            hedge_min=float(os.environ.get("HEDGE_MIN_DELAY", "0.5")),
+            hedge_max=float(os.environ.get("HEDGE_MAX_DELAY", "10.0")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    @property
+    def model_name(self) -> str:
+        return _provider_name(self.primary)
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < self.min_samples:
+            return self.hedge_initial
+        ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return min(self.hedge_max, max(self.hedge_min, p95))
+
+    def _start(self, pending, name, model, messages, stop, kwargs):
+        stream = model.astream(messages, stop=stop, config={"callbacks": []}, **kwargs)
+        task = asyncio.create_task(stream.__anext__())
+        pending[task] = (name, stream, time.perf_counter())
+
+    async def _close(self, pending):
+        for task in pending:
+            task.cancel()
+        for task, (_, stream, _) in pending.items():
+            try:
+                await task
+            except BaseException:
+                pass
+            try:
+                await stream.aclose()
+            except BaseException:
+                pass
+        pending.clear()
+
+    async def _race(self, messages, stop, kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        queue = list(zip(self.backup_names, self.backups))
+        pending = {}
+        last_error = None
+
+        self._start(pending, "primary", self.primary, messages, stop, kwargs)
+        next_hedge = loop.time() + self.hedge_delay()
+        try:
+            while True:
+                until = deadline if not queue else min(deadline, next_hedge)
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0.0, until - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if loop.time() >= deadline:
+                        raise DeadlineExceeded(
+                            f"No first token within {self.deadline:g}s"
+                        )
+                    if not queue or loop.time() < next_hedge:
+                        # Woke up a hair early (timer resolution); keep waiting
+                        continue
+                    name, model = queue.pop(0)
+                    logger.info("Hedging to %s after %.2fs", name, self.hedge_delay())
+                    self._start(pending, name, model, messages, stop, {})
+                    next_hedge = loop.time() + self.hedge_delay()
+                    continue
+
+                for task in done:
+                    name, stream, started = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return name, stream, task.result(), started
+                    last_error = error
+                    logger.warning("Provider %s failed before first token: %s", name, error)
+                    try:
+                        await stream.aclose()
+                    except BaseException:
+                        pass
+
+                if not pending:
+                    if not queue:
+                        raise last_error
+                    name, model = queue.pop(0)
+                    HEDGED_CALLS.inc(outcome="failover")
+                    self._start(pending, name, model, messages, stop, {})
+                    next_hedge = loop.time() + self.hedge_delay()
+        finally:
+            await self._close(pending)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        name, stream, first, started = await self._race(messages, stop, kwargs)
+
+        latency = time.perf_counter() - started
+        if name == "primary":
+            self._latencies.append(latency)
+        FIRST_TOKEN_LATENCY.observe(
+            latency, provider=self.model_name if name == "primary" else name
+        )
+        HEDGED_CALLS.inc(outcome="primary" if name == "primary" else "backup")
+
+        try:
+            chunk = first
+            while True:
+                # Inner streams yield message chunks tagged with their own run id
+                chunk.id = None
+                yield ChatGenerationChunk(message=chunk)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"Response exceeded {self.deadline:g}s")
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    return
+        finally:
+            await stream.aclose()
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(
+            self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    # Scripts only; the API path is async
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self.primary.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
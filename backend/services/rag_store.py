@@ -1,52 +1,95 @@
-from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_openai import OpenAIEmbeddings
 
-import faiss
-from langchain_community.vectorstores import FAISS 
-import os 
+from langchain_community.vectorstores import FAISS
+import os
+from embedding_cache import CachedEmbeddings
+from ingest_manifest import IngestManifest, chunk_id, file_sha256
+from pdf_chunks import find_pdfs, split_pdfs
 load_dotenv()
-embeddings = OpenAIEmbeddings(model='text-embedding-ada-002', openai_api_key=os.environ.get("OPENAI_API_KEY"))
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(model='text-embedding-ada-002', openai_api_key=os.environ.get("OPENAI_API_KEY")),
+    model='text-embedding-ada-002',
+)
+
+LESSON_DIRECTORY = "Lesson plans"
+STORE_PATH = "vietnamese_store"
 
-import os
 
-pdfs = []
-for root, dirs, files in os.walk("Lesson plans"):
-    # print(root, dirs, files)
-    for file in files:
-        if file.endswith(".pdf"):
-            pdfs.append(os.path.join(root, file))
+# Builds or incrementally updates the FAISS store. The manifest saved next to
+# the index (ingest_manifest.json) records every PDF's hash and chunk ids, so
+# a re-run only embeds new/changed chunks and deletes the ones that are gone.
+# Without a manifest the store is rebuilt from scratch.
+def build_vector_store(directory=LESSON_DIRECTORY, store_path=STORE_PATH):
+    manifest = IngestManifest(os.path.join(store_path, "ingest_manifest.json"), embeddings.model)
+    vector_store = None
+    if manifest.files and os.path.exists(os.path.join(store_path, "index.faiss")):
+        vector_store = FAISS.load_local(store_path, embeddings, allow_dangerous_deserialization=True)
+    else:
+        manifest.reset()
 
-print(pdfs)
+    pdfs = find_pdfs(directory)
+    print(pdfs)
 
-docs = []
-for pdf in pdfs:
-    loader = PyMuPDFLoader(pdf)
-    temp = loader.load()
-    docs.extend(temp)
-print(f"Loaded {len(docs)} documents")
+    files = [(pdf, os.path.relpath(pdf, directory), file_sha256(pdf)) for pdf in pdfs]
+    changed = [
+        (pdf, source, sha256) for pdf, source, sha256 in files
+        if not manifest.is_current(source, sha256)
+    ]
+    # Document chunking, page by page, across INGEST_WORKERS processes;
+    # results stream back one PDF at a time, in pdfs order
+    parsed = split_pdfs(pdf for pdf, _, _ in changed)
 
-# Document chunking
-from langchain_text_splitters import  RecursiveCharacterTextSplitter
+    stale_ids = []
+    added = 0
+    for (pdf, source, sha256), pages in zip(changed, parsed):
+        chunks = [chunk for page in pages for chunk in page]
+        ids = [
+            chunk_id(f"{source}:{chunk.metadata.get('page')}", chunk.page_content)
+            for chunk in chunks
+        ]
+        old_ids = manifest.ids(source)
+        stale_ids.extend(old_ids - set(ids))
+        manifest.record(source, sha256, ids, len(pages))
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-chunks = text_splitter.split_documents(docs)
+        new_chunks = {}
+        for chunk, id in zip(chunks, ids):
+            if id not in old_ids and id not in new_chunks:
+                new_chunks[id] = chunk
+        if not new_chunks:
+            continue
 
-import tiktoken
+        # Document vector embedding (reuses the cached embeddings from above)
+        texts = [chunk.page_content for chunk in new_chunks.values()]
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        metadatas = [chunk.metadata for chunk in new_chunks.values()]
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(
+                text_embeddings, embeddings, metadatas=metadatas, ids=list(new_chunks)
+            )
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=list(new_chunks))
+        added += len(new_chunks)
 
-encoding = tiktoken.encoding_for_model("gpt-4o-mini")
-print(len(encoding.encode(chunks[0].page_content)), len(encoding.encode(chunks[1].page_content)), len(encoding.encode(docs[1].page_content)))
+    stale_ids.extend(manifest.forget_missing(os.path.relpath(pdf, directory) for pdf in pdfs))
+    live_ids = manifest.all_ids()
+    stale_ids = [id for id in dict.fromkeys(stale_ids) if id not in live_ids]
+    if stale_ids and vector_store is not None:
+        vector_store.delete(stale_ids)
+
+    if vector_store is not None and (added or stale_ids):
+        vector_store.save_local(store_path)
+    manifest.save()
+    print(
+        f"{len(changed)} changed / {len(pdfs) - len(changed)} unchanged PDFs, "
+        f"{added} chunks embedded, {len(stale_ids)} removed"
+    )
+    return vector_store
 
-# Document vector embedding
-embeddings = OpenAIEmbeddings(model='text-embedding-ada-002', openai_api_key=os.environ.get("OPENAI_API_KEY"))
-# Use the first chunk's embedding dimension to create FAISS index
-embedding_dimension = len(embeddings.embed_query(chunks[0].page_content))
-# Create a FAISS index with correct dimension
-index = faiss.IndexFlatL2(embedding_dimension)
-# Building the vector store directly from document chunks (embeddings done internally)
-vector_store = FAISS.from_documents(chunks, embeddings)
-vector_store.save_local("vietnamese_store")
 
 def get_vector_store():
-    return FAISS.load_local("vietnamese_store", embeddings, allow_dangerous_deserialization=True)
\ No newline at end of file
+    return FAISS.load_local("vietnamese_store", embeddings, allow_dangerous_deserialization=True)
+
+
+if __name__ == "__main__":
+    build_vector_store()
@@ -1,62 +1,81 @@
 import os
+import time
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import Distance, VectorParams
-from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import PointIdsList, PointStruct
+
+from pymongo import MongoClient
+
+try:
+    from services.corpus_version import bump_collection_version
+    from services.embedding_cache import CachedEmbeddings
+    from services.fake_providers import HashingEmbeddings, fake_providers_enabled
+    from services.ingest_manifest import MongoIngestManifest, chunk_id, file_sha256
+    from services.logging_setup import configure_logging
+    from services.pdf_chunks import find_pdfs, page_count, split_pdfs
+except ImportError:  # run as a script from the services folder
+    from corpus_version import bump_collection_version
+    from embedding_cache import CachedEmbeddings
+    from fake_providers import HashingEmbeddings, fake_providers_enabled
+    from ingest_manifest import MongoIngestManifest, chunk_id, file_sha256
+    from logging_setup import configure_logging
+    from pdf_chunks import find_pdfs, page_count, split_pdfs
 
 load_dotenv()
-# Initialize Qdrant client for your cloud instance
-client = QdrantClient(
-    url=os.environ.get("QDRANT_URL_KEY") , 
-    api_key=os.environ.get("QDRANT_API_KEY")      
-)
+# QDRANT_URL_KEY=":memory:" (the default with LLM_PROVIDER=fake) runs Qdrant
+# in-process; the API seeds it at startup (see seed_local_corpus).
+QDRANT_URL = os.environ.get("QDRANT_URL_KEY") or (":memory:" if fake_providers_enabled() else None)
+QDRANT_IN_MEMORY = QDRANT_URL == ":memory:"
 
-# Initialize OpenAI embeddings
-embeddings = OpenAIEmbeddings(model='text-embedding-ada-002', openai_api_key=os.environ.get("OPENAI_API_KEY"))
+if QDRANT_IN_MEMORY:
+    # Separate stores: scripts use `client`, the API uses `async_client`
+    client = QdrantClient(location=":memory:")
+    async_client = AsyncQdrantClient(location=":memory:")
+else:
+    # Initialize Qdrant client for your cloud instance
+    client = QdrantClient(
+        url=QDRANT_URL,
+        api_key=os.environ.get("QDRANT_API_KEY")
+    )
+    # Async handle to the same instance for the API request path
+    async_client = AsyncQdrantClient(
+        url=QDRANT_URL,
+        api_key=os.environ.get("QDRANT_API_KEY"),
+    )
 
-# Lesson plans, vietnamese_store
-def upload_documents_to_qdrant(directory, coll_name):
-    # Load PDF files from directory
-    pdfs = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".pdf"):
-                pdfs.append(os.path.join(root, file))
-
-    # Load documents from all PDFs
-    docs = []
-    # Use a single lesson counter across all PDFs so lesson_index increments
-    # globally instead of resetting for each PDF. If you prefer per-PDF
-    # numbering, keep the counter inside the loop.
-    lesson_counter = 1
-    for pdf in pdfs:
-        print(pdf)
-        loader = PyMuPDFLoader(pdf)
-
-        loaded_docs = loader.load()
-        # Add a tag to each loaded document's metadata before chunking
-        for doc in loaded_docs:
-            if doc.metadata is None:
-                doc.metadata = {}
-            doc.metadata["lesson_index"] = lesson_counter
-            print('test', lesson_counter, doc.metadata)
-            lesson_counter += 1
-        # extend with the modified loaded_docs (not a fresh loader.load() call)
-        docs.extend(loaded_docs)
-
-    print(f"Loaded {len(docs)} documents")
-
-    # Chunk documents for manageable embedding units
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(docs)
-
-    # Optionally check embedding size
-    embedding_dimension = len(embeddings.embed_query(chunks[0].page_content))
-    print(f"Embedding dimension: {embedding_dimension}")
+# Initialize embeddings behind the shared memory/disk cache
+if fake_providers_enabled():
+    embeddings = CachedEmbeddings(HashingEmbeddings(size=1536), model="fake-hashing-1536")
+else:
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model='text-embedding-ada-002', openai_api_key=os.environ.get("OPENAI_API_KEY")),
+        model='text-embedding-ada-002',
+    )
+
+# Chunks embedded and upserted (or ids deleted) per request during ingest
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "128"))
+
+
+def point_id(chunk) -> str:
+    # Derived from the page's lesson_index and the chunk text: stable across
+    # runs, and distinct for every chunk of a page
+    return chunk_id(chunk.metadata["lesson_index"], chunk.page_content)
 
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ensure_collection(coll_name, embedding_dimension):
     # Create Qdrant collection if not exists
     if not client.collection_exists(coll_name):
         client.create_collection(
@@ -70,21 +89,139 @@ def upload_documents_to_qdrant(directory, coll_name):
             field_schema="integer"  # since lesson_index is a number
         )
 
-    # Prepare points as PointStruct instances with vector and payload
-    points = [
-        PointStruct(
-            # id=idx,
-            id=chunk.metadata.get('lesson_index'),   # string id
-            vector=list(embeddings.embed_query(chunk.page_content)),
-            payload={"text": chunk.page_content, "lesson_index": chunk.metadata.get("lesson_index")}
+
+# Yields the chunks that aren't in the collection yet, file by file, and
+# updates the manifest as it goes; ids that disappeared go to `stale_ids`.
+# Files that need parsing stream out of a process pool (split_pdfs) in file
+# order, one at a time; unchanged files are never parsed.
+def iter_changed_chunks(directory, pdfs, manifest, stale_ids, stats, workers=None):
+    # Use a single lesson counter across all PDFs so lesson_index increments
+    # globally instead of resetting for each PDF (one lesson_index per page).
+    # Numbering follows the sorted file order, not the order workers finish in.
+    plan = []
+    lesson_counter = 1
+    for pdf in pdfs:
+        source = os.path.relpath(pdf, directory)
+        sha256 = file_sha256(pdf)
+        entry = manifest.entry(source)
+        if entry is not None and entry["sha256"] == sha256:
+            pages = entry["pages"]
+        else:
+            pages = page_count(pdf)
+        # Parsed if new, changed, or its lessons moved (an earlier file
+        # gained or lost pages)
+        parse = not manifest.is_current(source, sha256, lesson_counter)
+        plan.append((pdf, source, sha256, lesson_counter, pages, parse))
+        lesson_counter += pages
+
+    to_parse = [pdf for pdf, *_, parse in plan if parse]
+    parsed = split_pdfs(to_parse, workers)
+    for pdf, source, sha256, first_lesson, page_total, parse in plan:
+        if not parse:
+            stats["unchanged_files"] += 1
+            continue
+
+        pages = next(parsed)
+        if len(pages) != page_total:
+            raise RuntimeError(f"{source}: parsed {len(pages)} pages, expected {page_total}")
+        chunks = []
+        for lesson_index, page in enumerate(pages, start=first_lesson):
+            for chunk in page:
+                chunk.metadata["lesson_index"] = lesson_index
+                chunks.append(chunk)
+        del pages
+
+        old_ids = manifest.ids(source)
+        ids = [point_id(chunk) for chunk in chunks]
+        stale_ids.extend(old_ids - set(ids))
+        manifest.record(source, sha256, ids, page_total, first_lesson)
+        stats["changed_files"] += 1
+        print(f"[INGEST] {source}: {len(chunks)} chunks, lessons {first_lesson}-{first_lesson + page_total - 1}")
+
+        for chunk, id in zip(chunks, ids):
+            if id not in old_ids:
+                # Identical chunks on one page share an id; upsert it once
+                old_ids.add(id)
+                chunk.metadata["point_id"] = id
+                yield chunk
+
+
+# Lesson plans, vietnamese_store
+# Incremental: a manifest (services/ingest_manifest.py), kept in the
+# MONGO_DB_NAME database next to the corpus versions, records every file's
+# hash and point ids, so a re-run from any machine only embeds and upserts new or changed
+# chunks and deletes the points of removed ones. Chunks are embedded with one
+# embed_documents call and upserted per batch of `batch_size`, so memory stays
+# bounded by a few PDFs plus one batch. Point ids are content-derived
+# (point_id). PDFs are parsed by `workers` processes (default INGEST_WORKERS).
+# recreate=True drops the collection and manifest first (full rebuild).
+def upload_documents_to_qdrant(directory, coll_name, batch_size=None, recreate=False, workers=None):
+    mongo_client = MongoClient(os.environ.get("ATLAS_URI"))
+    try:
+        db = mongo_client[os.environ.get("MONGO_DB_NAME", "language_app")]
+        _upload_documents(db, directory, coll_name, batch_size or INGEST_BATCH_SIZE, recreate, workers)
+    finally:
+        mongo_client.close()
+
+
+def _upload_documents(db, directory, coll_name, batch_size, recreate, workers):
+    pdfs = find_pdfs(directory)
+    print(f"[INGEST] {coll_name}: {len(pdfs)} PDFs under {directory}")
+
+    manifest = MongoIngestManifest(db, coll_name, embeddings.model)
+    if recreate and client.collection_exists(coll_name):
+        client.delete_collection(coll_name)
+    if not client.collection_exists(coll_name):
+        # Nothing is stored, whatever the manifest says
+        manifest.reset()
+
+    started = time.perf_counter()
+    stale_ids = []
+    stats = {"unchanged_files": 0, "changed_files": 0}
+    upserted = 0
+    changed = iter_changed_chunks(directory, pdfs, manifest, stale_ids, stats, workers)
+    for batch in iter_batches(changed, batch_size):
+        texts = [chunk.page_content for chunk in batch]
+        vectors = embeddings.embed_documents(texts)
+        ensure_collection(coll_name, len(vectors[0]))
+
+        client.upsert(
+            collection_name=coll_name,
+            points=[
+                PointStruct(
+                    id=chunk.metadata["point_id"],
+                    vector=list(vector),
+                    payload={"text": chunk.page_content, "lesson_index": chunk.metadata.get("lesson_index")}
+                )
+                for chunk, vector in zip(batch, vectors)
+            ],
+        )
+        upserted += len(batch)
+        elapsed = time.perf_counter() - started
+        print(
+            f"[INGEST] {coll_name}: {upserted} chunks upserted "
+            f"(through lesson {batch[-1].metadata['lesson_index']}, "
+            f"{upserted / elapsed:.1f} chunks/s)"
         )
-        for idx, chunk in enumerate(chunks)
-    ]
 
-    # Upsert points into the Qdrant collection
-    client.upsert(collection_name=coll_name, points=points)
+    stale_ids.extend(manifest.forget_missing(os.path.relpath(pdf, directory) for pdf in pdfs))
+    # An id can move between files (same page text, shifted lesson_index)
+    live_ids = manifest.all_ids()
+    stale_ids = [id for id in dict.fromkeys(stale_ids) if id not in live_ids]
+    for batch in iter_batches(stale_ids, batch_size):
+        client.delete(collection_name=coll_name, points_selector=PointIdsList(points=batch))
+    manifest.save()
 
-    print(f"Upserted {len(points)} points to Qdrant")
+    print(
+        f"[INGEST] {coll_name}: done in {time.perf_counter() - started:.1f}s, "
+        f"{stats['changed_files']} changed / {stats['unchanged_files']} unchanged files, "
+        f"{upserted} chunks upserted, {len(stale_ids)} deleted"
+    )
+    if not upserted and not stale_ids:
+        return
+
+    # Invalidates response/retrieval caches built from the previous corpus
+    bump_collection_version(db, coll_name)
 
 # Example function to query the vector store by similarity
 # vietnamese_store
@@ -97,9 +234,28 @@ def query_qdrant(coll_name, query_text, top_k=5):
     )
     return search_result
 
+async def aquery_qdrant(coll_name, query_text, top_k=5):
+    query_vector = list(await embeddings.aembed_query(query_text))
+    search_result = await async_client.search(
+        collection_name=coll_name,
+        query_vector=query_vector,
+        limit=top_k
+    )
+    return search_result
+
 def get_qdrant_client():
     return client
 
-# Upload documents, only need to run once
-# upload_documents_to_qdrant("Lesson plans", "vietnamese_store_with_metadata_indexed")
-# upload_documents_to_qdrant("Test plans", "vietnamese_test_store")
+def get_async_qdrant_client():
+    return async_client
+
+def get_embeddings():
+    return embeddings
+
+
+# Ingest entry point (run from the services folder). Guarded so the parse
+# workers, which re-import this module under spawn/forkserver, don't ingest.
+if __name__ == "__main__":
+    configure_logging()
+    upload_documents_to_qdrant("Lesson plans", "vietnamese_store_with_metadata_indexed")
+    upload_documents_to_qdrant("Test plans", "vietnamese_test_store")
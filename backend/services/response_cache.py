@@ -0,0 +1,106 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Caches tutor responses per model tier and lesson, and serves them for new
+    questions whose embedding is close enough (cosine similarity >= threshold)
+    to a cached one. Tiers never share entries, so a fast-tier answer isn't
+    served to a turn routed to the full model.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted past `max_entries`. Each lesson's entries are tagged with the
+    corpus version of the lesson collection and dropped when it changes
+    (i.e. after a re-ingest).
+    """
+
+    def __init__(self, versions, collection: str, threshold=None, ttl=None, max_entries=None):
+        self.versions = versions
+        self.collection = collection
+        self.threshold = threshold if threshold is not None else float(
+            os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.95")
+        )
+        self.ttl = ttl if ttl is not None else float(
+            os.environ.get("RESPONSE_CACHE_TTL", "86400")
+        )
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get("RESPONSE_CACHE_SIZE", "1000")
+        )
+
+        # (tier, lesson_id) -> {"version": str, "entries": {entry_id: entry}}
+        self._lessons = {}
+        # entry_id -> (tier, lesson_id), least recently used first
+        self._order = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def _drop(self, entry_id):
+        key = self._order.pop(entry_id, None)
+        bucket = self._lessons.get(key)
+        if bucket:
+            bucket["entries"].pop(entry_id, None)
+
+    async def _bucket(self, key):
+        version = await self.versions.get(self.collection)
+        bucket = self._lessons.get(key)
+        if bucket is None or bucket["version"] != version:
+            if bucket:
+                for entry_id in list(bucket["entries"]):
+                    self._order.pop(entry_id, None)
+            bucket = {"version": version, "entries": {}}
+            self._lessons[key] = bucket
+        return bucket
+
+    async def lookup(self, tier: str, lesson_id, vector):
+        bucket = await self._bucket((tier, lesson_id))
+        now = time.monotonic()
+        for entry_id, entry in list(bucket["entries"].items()):
+            if now - entry["created_at"] > self.ttl:
+                self._drop(entry_id)
+
+        entries = list(bucket["entries"].items())
+        if not entries:
+            self._misses += 1
+            return None
+
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = np.stack([e["vector"] for _, e in entries]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self._misses += 1
+            return None
+
+        entry_id, entry = entries[best]
+        self._order.move_to_end(entry_id)
+        self._hits += 1
+        return entry["response"]
+
+    async def store(self, tier: str, lesson_id, vector, response: str):
+        bucket = await self._bucket((tier, lesson_id))
+        normalized = np.asarray(vector, dtype=np.float32)
+        normalized /= np.linalg.norm(normalized) or 1.0
+
+        entry_id = str(uuid.uuid4())
+        bucket["entries"][entry_id] = {
+            "vector": normalized,
+            "response": response,
+            "created_at": time.monotonic(),
+        }
+        self._order[entry_id] = (tier, lesson_id)
+        while len(self._order) > self.max_entries:
+            self._drop(next(iter(self._order)))
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._order),
+        }
@@ -0,0 +1,63 @@
+import os
+import re
+import time
+from collections import OrderedDict
+
+from services.embedding_cache import normalize_text
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", normalize_text(text)).strip().lower()
+
+
+class RetrievalCache:
+    """
+    LRU + TTL cache of vector search results for the static RAG collections.
+
+    Keys are (collection, corpus version, lesson filter, top_k, normalized query).
+    Because the corpus version is part of the key, an ingest run (which bumps
+    the version) makes every older entry unreachable; those age out through
+    the LRU. Results are stored as plain {"text", "score"} dicts.
+    """
+
+    def __init__(self, versions, ttl=None, max_entries=None):
+        self.versions = versions
+        self.ttl = ttl or float(os.environ.get("RETRIEVAL_CACHE_TTL", "86400"))
+        self.max_entries = max_entries or int(
+            os.environ.get("RETRIEVAL_CACHE_SIZE", "5000")
+        )
+        self._entries = OrderedDict()
+        # collection -> [hits, misses]
+        self._counts = {}
+
+    # `search` is an async callable running the real query on a miss;
+    # it must return a list of {"text", "score"} dicts
+    async def fetch(self, collection: str, query: str, top_k: int, search, lesson_index=None):
+        version = await self.versions.get(collection)
+        key = (collection, version, lesson_index, top_k, normalize_query(query))
+        counts = self._counts.setdefault(collection, [0, 0])
+
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            self._entries.move_to_end(key)
+            counts[0] += 1
+            return entry[0]
+
+        counts[1] += 1
+        results = await search()
+        self._entries[key] = (results, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return results
+
+    def stats(self):
+        collections = {}
+        for name, (hits, misses) in self._counts.items():
+            lookups = hits + misses
+            collections[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+        return {"entries": len(self._entries), "collections": collections}
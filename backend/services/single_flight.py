@@ -0,0 +1,53 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+from services.metrics import COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts) -> str:
+    """Stable key for a request from its identifying fields."""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for `key` is running,
+    later callers with the same key await that call instead of starting their
+    own, and all of them get its result (or its exception).
+
+    The shared call runs as its own task and callers await it through
+    asyncio.shield, so a caller that disconnects doesn't cancel the work for
+    the others. Keys are forgotten as soon as the call finishes; this is not a
+    result cache.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    # `fn` is a zero-argument coroutine function, only called by the leader;
+    # `name` labels the coalescing metric (usually the endpoint)
+    async def do(self, name: str, key: str, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            logger.info("%s: joining in-flight call %s", name, key[:12])
+            COALESCED_REQUESTS.inc(endpoint=name)
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Nobody may be left awaiting (all callers cancelled); mark it retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,55 @@
+import os
+import re
+import unicodedata
+
+FAST_TIER = "fast"
+FULL_TIER = "full"
+
+# Turns longer than this always go to the full tier
+FAST_MAX_WORDS = int(os.environ.get("ROUTER_FAST_MAX_WORDS", "8"))
+
+_GREETING = re.compile(
+    r"^(hi|hello|hey|yo|chao|xin chao|chao ban|good (morning|afternoon|evening)|"
+    r"thanks?( you)?|thank u|ty|cam on|ok(ay)?|yes|yeah|yep|no|nope|sure|cool|"
+    r"great|got it|i see|bye|goodbye|tam biet|co|khong|vang|da)\b"
+)
+_LOOKUP = re.compile(
+    r"(how do (you|i) say|what does .+ mean|what is .+ in (vietnamese|english)|"
+    r"meaning of|translate|nghia la gi|la gi)"
+)
+# Anything that asks for an explanation, correction or exercise needs the full model
+_NEEDS_REASONING = re.compile(
+    r"\b(why|explain|grammar|difference|differ|compare|correct|mistake|wrong|"
+    r"quiz|test me|practice|exercise|lesson|teach|example|sentence|tone|tones|"
+    r"tai sao|giai thich|ngu phap|sua|bai tap)\b"
+)
+
+
+def _fold(text: str) -> str:
+    # Lowercase and strip Vietnamese diacritics so patterns match typed or untyped text
+    text = unicodedata.normalize("NFD", text.lower()).replace("đ", "d")
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s']", " ", text)).strip()
+
+
+def classify_turn(text: str) -> tuple:
+    """
+    Cheap heuristic tiering of a user turn; returns (tier, reason).
+
+    Short greetings, acknowledgements and single vocabulary lookups go to the
+    fast tier; anything long or asking for explanation/correction/practice
+    goes to the full tier. When unsure the turn goes to the full tier.
+    """
+    folded = _fold(text or "")
+    words = len(folded.split())
+    if not folded:
+        return FULL_TIER, "empty"
+    if words > FAST_MAX_WORDS:
+        return FULL_TIER, "long"
+    if _NEEDS_REASONING.search(folded):
+        return FULL_TIER, "reasoning"
+    if _GREETING.match(folded):
+        return FAST_TIER, "conversational"
+    if _LOOKUP.search(folded):
+        return FAST_TIER, "lookup"
+    return FULL_TIER, "default"
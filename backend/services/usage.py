@@ -0,0 +1,189 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+USAGE_COLLECTION = "usage"
+
+# USD per 1M tokens (input, output); matched by model name prefix.
+# Keep in sync with the provider's price list.
+PRICES = {
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5": (1.25, 10.00),
+    # Backup providers (services/providers.py)
+    "mistral-large": (2.00, 6.00),
+    "open-mistral-nemo": (0.15, 0.15),
+    "claude-sonnet-4-5": (3.00, 15.00),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+_current = ContextVar("request_usage", default=None)
+_node = ContextVar("usage_node", default=None)
+
+
+def price_of(model: str, input_tokens: int, output_tokens: int) -> float:
+    for prefix in sorted(PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            per_input, per_output = PRICES[prefix]
+            return (input_tokens * per_input + output_tokens * per_output) / 1_000_000
+    return 0.0
+
+
+class RequestUsage:
+    """Token usage of one request (or one memory-writer batch), per node and model."""
+
+    def __init__(self, endpoint: str, user_id=None, chat_id=None):
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.chat_id = chat_id
+        # (node, model) -> [calls, input_tokens, output_tokens, estimated]
+        self._rows = {}
+
+    def add(self, node: str, model: str, input_tokens: int, output_tokens: int, estimated=False):
+        row = self._rows.setdefault((node, model), [0, 0, 0, False])
+        row[0] += 1
+        row[1] += input_tokens
+        row[2] += output_tokens
+        row[3] = row[3] or estimated
+
+    def __bool__(self):
+        return bool(self._rows)
+
+    def document(self, share=1.0, user_id=None, chat_id=None) -> dict:
+        nodes = []
+        for (node, model), (calls, input_tokens, output_tokens, estimated) in self._rows.items():
+            input_tokens = round(input_tokens * share)
+            output_tokens = round(output_tokens * share)
+            nodes.append(
+                {
+                    "node": node,
+                    "model": model,
+                    "calls": calls,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "cost_usd": price_of(model, input_tokens, output_tokens),
+                    "estimated": estimated,
+                }
+            )
+        return {
+            "user_id": user_id or self.user_id,
+            "chat_id": chat_id or self.chat_id,
+            "endpoint": self.endpoint,
+            "created_at": datetime.utcnow(),
+            "nodes": nodes,
+            "input_tokens": sum(n["input_tokens"] for n in nodes),
+            "output_tokens": sum(n["output_tokens"] for n in nodes),
+            "total_tokens": sum(n["total_tokens"] for n in nodes),
+            "cost_usd": sum(n["cost_usd"] for n in nodes),
+        }
+
+
+@contextmanager
+def track_usage(usage: RequestUsage):
+    """Attributes every LLM/embedding call made inside the block to `usage`."""
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def usage_node(name: str):
+    """Names the node for calls made outside a graph (e.g. the memory writer)."""
+    token = _node.set(name)
+    try:
+        yield
+    finally:
+        _node.reset(token)
+
+
+def record(model: str, input_tokens: int, output_tokens: int, node=None, estimated=False):
+    usage = _current.get()
+    if usage is None:
+        return
+    usage.add(node or _node.get() or "unknown", model, input_tokens, output_tokens, estimated)
+
+
+# Embedding responses carry no usage through LangChain; ~4 characters per token
+def record_embedding(model: str, texts: list):
+    record(model, sum((len(t) + 3) // 4 for t in texts), 0, estimated=True)
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Reads usage_metadata from every chat model response and records it on the
+    current request. The graph node comes from LangGraph's run metadata.
+    """
+
+    # Run in the caller's task so the request's context variables are visible
+    run_inline = True
+
+    def __init__(self):
+        self._nodes = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._nodes[run_id] = (metadata or {}).get("langgraph_node")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._nodes.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node = self._nodes.pop(run_id, None)
+        try:
+            message = response.generations[0][0].message
+        except (IndexError, AttributeError):
+            return
+        usage = getattr(message, "usage_metadata", None) or {}
+        if not usage:
+            return
+        model = (
+            (message.response_metadata or {}).get("model_name")
+            or (response.llm_output or {}).get("model_name")
+            or "unknown"
+        )
+        record(
+            model,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            node=node,
+        )
+
+
+class UsageStore:
+    """Persists RequestUsage documents to the `usage` collection."""
+
+    def __init__(self, db):
+        self.collection = db[USAGE_COLLECTION]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("user_id", 1), ("created_at", -1)])
+        await self.collection.create_index([("chat_id", 1), ("created_at", -1)])
+
+    async def save(self, usage: RequestUsage):
+        if not usage:
+            return
+        try:
+            await self.collection.insert_one(usage.document())
+        except Exception as e:
+            logger.warning("Failed to save usage for %s: %s", usage.endpoint, e)
+
+    # A memory-writer batch serves several turns; its tokens are split evenly
+    async def save_split(self, usage: RequestUsage, jobs: list):
+        if not usage or not jobs:
+            return
+        share = 1.0 / len(jobs)
+        docs = [
+            usage.document(share=share, user_id=job["user_id"], chat_id=job["chat_id"])
+            for job in jobs
+        ]
+        try:
+            await self.collection.insert_many(docs)
+        except Exception as e:
+            logger.warning("Failed to save memory writer usage: %s", e)
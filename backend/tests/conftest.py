@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import the app modules the way main.py does (api.*, services.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Offline providers and in-memory Qdrant; no network or API keys needed
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("QDRANT_URL_KEY", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
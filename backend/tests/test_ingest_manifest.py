@@ -0,0 +1,38 @@
+import mongomock
+
+from services.ingest_manifest import MongoIngestManifest
+
+
+def test_manifest_is_shared_through_mongo():
+    db = mongomock.MongoClient()["language_app"]
+
+    first = MongoIngestManifest(db, "lessons", "model-a")
+    first.record("a.pdf", "sha-a", ["id-1", "id-2"], pages=1, first_lesson=1)
+    first.record("b.pdf", "sha-b", ["id-3"], pages=1, first_lesson=2)
+    first.save()
+
+    # Another machine sees the same record and can drop a removed file
+    second = MongoIngestManifest(db, "lessons", "model-a")
+    assert second.is_current("a.pdf", "sha-a", 1)
+    assert second.forget_missing(["a.pdf"]) == ["id-3"]
+    second.save()
+
+    third = MongoIngestManifest(db, "lessons", "model-a")
+    assert set(third.files) == {"a.pdf"}
+    assert third.ids("a.pdf") == {"id-1", "id-2"}
+    # Collections don't share entries
+    assert MongoIngestManifest(db, "tests", "model-a").files == {}
+
+
+def test_entries_of_another_model_are_ignored_and_replaced():
+    db = mongomock.MongoClient()["language_app"]
+    old = MongoIngestManifest(db, "lessons", "model-a")
+    old.record("a.pdf", "sha-a", ["id-1"], pages=1, first_lesson=1)
+    old.save()
+
+    new = MongoIngestManifest(db, "lessons", "model-b")
+    assert new.files == {}
+    new.record("b.pdf", "sha-b", ["id-2"], pages=1, first_lesson=1)
+    new.save()
+
+    assert [doc["source"] for doc in db.ingest_manifests.find()] == ["b.pdf"]
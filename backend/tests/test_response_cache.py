@@ -0,0 +1,33 @@
+import asyncio
+
+from services.response_cache import SemanticResponseCache
+
+
+class _Versions:
+    async def get(self, collection):
+        return "v1"
+
+
+def test_tiers_do_not_share_answers():
+    async def run():
+        cache = SemanticResponseCache(_Versions(), "lessons")
+        await cache.store("fast_agent", 3, [1.0, 0.0], "short answer")
+
+        assert await cache.lookup("fast_agent", 3, [1.0, 0.0]) == "short answer"
+        assert await cache.lookup("general_agent", 3, [1.0, 0.0]) is None
+
+    asyncio.run(run())
+
+
+def test_zero_settings_are_kept():
+    async def run():
+        cache = SemanticResponseCache(_Versions(), "lessons", threshold=0, ttl=0)
+        assert (cache.threshold, cache.ttl) == (0, 0)
+
+        await cache.store("general_agent", 3, [1.0, 0.0], "answer")
+        await asyncio.sleep(0.01)
+        # ttl=0 expires everything straight away
+        assert await cache.lookup("general_agent", 3, [0.0, 1.0]) is None
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(run())
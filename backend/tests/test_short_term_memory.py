@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+from api import agents
+from api.miscellanous import save_chat_turn
+from services.fake_mongo import FakeAsyncMongoClient
+
+
+class _SummaryLLM:
+    async def ainvoke(self, prompt, **kwargs):
+        return SimpleNamespace(content="summary")
+
+
+def test_every_turn_is_in_the_summary_or_the_window():
+    async def run():
+        db = FakeAsyncMongoClient()["language_app"]
+        agent = agents.ManagerAgent(
+            db=db, llm=_SummaryLLM(), fast_llm=_SummaryLLM(), embeddings=object(), qdrant=object()
+        )
+        await db.chat_sessions.insert_one({"chat_id": "c1", "user_id": "u1", "messages": []})
+
+        folds = []
+        for turn in range(60):
+            await save_chat_turn("c1", f"message {turn}", role="user", db=db)
+            await agent.refresh_summary("c1")
+
+            state = await agent.retrieve_short_term_memories({"chat_id": "c1", "user_id": "u1"})
+            window = [m for m in state["short_term"] if m["role"] != "summary"]
+            chat = await db.chat_sessions.find_one({"chat_id": "c1"})
+            summarized_through = chat.get("summarized_through", -1)
+            if summarized_through >= 0 and summarized_through not in folds:
+                folds.append(summarized_through)
+
+            # Summarized turns plus the raw window cover the whole history, once each
+            expected = [f"message {t}" for t in range(summarized_through + 1, turn + 1)]
+            assert [m["text"] for m in window] == expected
+            assert len(window) < agents.RECENT_MESSAGES + agents.SUMMARY_EVERY
+            if summarized_through >= 0:
+                assert state["short_term"][0]["role"] == "summary"
+
+        assert len(folds) > 1
+
+    asyncio.run(run())
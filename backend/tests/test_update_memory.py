@@ -0,0 +1,61 @@
+import asyncio
+
+from api import agents
+from services.fake_mongo import FakeAsyncMongoClient
+
+
+class _Writer:
+    def __init__(self):
+        self.jobs = []
+
+    async def submit(self, job):
+        self.jobs.append(job)
+
+
+def _agent(db):
+    agent = agents.ManagerAgent(
+        db=db, llm=object(), fast_llm=object(), embeddings=object(), qdrant=object()
+    )
+    agent.memory_writer = _Writer()
+    return agent
+
+
+def _state(text):
+    return {"user_id": "u1", "chat_id": "c1", "user_input": text, "response": f"re: {text}"}
+
+
+def test_turn_is_in_the_chat_before_the_writer_runs():
+    async def run():
+        db = FakeAsyncMongoClient()["language_app"]
+        agent = _agent(db)
+        await db.chat_sessions.insert_one({"chat_id": "c1", "user_id": "u1", "messages": []})
+
+        await agent.update_memory(_state("hi"))
+        state = await agent.retrieve_short_term_memories({"chat_id": "c1", "user_id": "u1"})
+
+        assert [m["text"] for m in state["short_term"]] == ["hi", "re: hi"]
+        assert agent.memory_writer.jobs[0]["chat_saved"] is True
+
+        # Replaying the job (writer retry) doesn't duplicate the messages
+        job = dict(agent.memory_writer.jobs[0], chat_saved=False)
+        await agent.save_turn_messages(job)
+        chat = await db.chat_sessions.find_one({"chat_id": "c1"})
+        assert len(chat["messages"]) == 2
+
+    asyncio.run(run())
+
+
+def test_failed_chat_write_is_left_to_the_writer():
+    async def run():
+        agent = _agent(FakeAsyncMongoClient()["language_app"])
+
+        async def down(job):
+            raise ConnectionError("mongo down")
+
+        agent.save_turn_messages = down
+        result = await agent.update_memory(_state("hi"))
+
+        assert len(result["message_ids"]) == 2
+        assert "chat_saved" not in agent.memory_writer.jobs[0]
+
+    asyncio.run(run())